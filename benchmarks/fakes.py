@@ -0,0 +1,606 @@
+"""In-process stand-ins for Spotify, Telegram and MongoDB used by the benchmarks.
+
+They implement just the parts of the Spotify Web API, python-telegram-bot and
+pymongo that telegram_bot.py uses, and count every call so the benchmarks can
+report them. FakeSpotifyServer puts the fake Spotify behind a local HTTP
+server, so the bot's real AsyncSpotify client is exercised as well.
+"""
+import asyncio
+import copy
+import itertools
+import json
+import random
+import string
+import threading
+import time
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+import bson
+from pymongo.errors import DuplicateKeyError
+from spotipy.exceptions import SpotifyException
+from telegram.error import RetryAfter
+
+BASE62 = string.digits + string.ascii_letters
+
+def random_id(rng, length=22):
+    """Random Spotify-style base62 ID"""
+    return ''.join(rng.choices(BASE62, k=length))
+
+def make_track(track_id):
+    """A playlist item shaped like the Spotify API's, generated from its ID"""
+    # Derived IDs keep this deterministic without seeding an RNG per track
+    album_id = track_id[11:] + track_id[:11]
+    return {
+        'added_at': '2024-01-01T00:00:00Z',
+        'track': {
+            'id': track_id,
+            'name': f'Song {track_id[:6]}',
+            'artists': [{'name': f'Artist {track_id[6:10]}', 'id': track_id[::-1]}],
+            'album': {
+                'id': album_id,
+                'name': f'Album {album_id[:6]}',
+                'images': [{'url': f'https://i.scdn.co/image/{album_id}', 'height': 640, 'width': 640}],
+            },
+            'external_urls': {'spotify': f'https://open.spotify.com/track/{track_id}'},
+            'duration_ms': 90_000 + sum(map(ord, track_id)) * 997 % 210_000,
+        }
+    }
+
+def make_local_track(name):
+    """A local file in a playlist; Spotify sends these with a null ID"""
+    return {
+        'added_at': '2024-01-01T00:00:00Z',
+        'is_local': True,
+        'track': {
+            'id': None,
+            'name': name,
+            'artists': [{'name': 'Local Artist', 'id': None}],
+            'album': {'id': None, 'name': 'Local Album', 'images': []},
+            'external_urls': {},
+            'duration_ms': 180_000,
+        }
+    }
+
+# Roughly what an unfiltered Spotify response carries on top of what we use
+UNFILTERED_EXTRAS = {
+    'available_markets': ['AD', 'AE', 'AR', 'AT', 'AU', 'BE', 'BG', 'BR', 'CA', 'CH'] * 18,
+    'disc_number': 1,
+    'explicit': False,
+    'popularity': 50,
+    'preview_url': None,
+}
+
+class FakeSpotify:
+    """Spotify Web API stand-in with pagination, latency and injected 429s.
+
+    `latency` is slept (blocking, like spotipy) on every request;
+    `rate_limit_every` makes every Nth request fail with a 429.
+    """
+
+    def __init__(self, latency=0.0, rate_limit_every=0, retry_after=1, seed=0):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        # Playlists only hold track IDs; items are generated when requested
+        self.playlists = {}
+        self.snapshots = {}
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.calls_by_endpoint = {}
+        self.bytes_sent = 0
+
+    # Test setup
+    def create_playlist(self, playlist_id, track_count):
+        self.playlists[playlist_id] = [random_id(self.rng) for _ in range(track_count)]
+        self.snapshots[playlist_id] = 1
+        return list(self.playlists[playlist_id])
+
+    def add_tracks(self, playlist_id, count):
+        new_ids = [random_id(self.rng) for _ in range(count)]
+        self.playlists[playlist_id].extend(new_ids)
+        self.snapshots[playlist_id] += 1
+        return new_ids
+
+    def remove_tracks(self, playlist_id, count):
+        track_ids = self.playlists[playlist_id]
+        removed_ids = set(self.rng.sample(track_ids, min(count, len(track_ids))))
+        self.playlists[playlist_id] = [track_id for track_id in track_ids if track_id not in removed_ids]
+        self.snapshots[playlist_id] += 1
+        return removed_ids
+
+    def add_local_file(self, playlist_id, name):
+        self.playlists[playlist_id].append(f'local:{name}')
+        self.snapshots[playlist_id] += 1
+
+    def move_track(self, playlist_id, from_index, to_index):
+        track_ids = self.playlists[playlist_id]
+        track_ids.insert(to_index, track_ids.pop(from_index))
+        self.snapshots[playlist_id] += 1
+
+    def reset_counters(self):
+        self.calls = 0
+        self.calls_by_endpoint = {}
+        self.bytes_sent = 0
+
+    # API
+    def _request(self, endpoint, result):
+        with self.lock:
+            self.calls += 1
+            self.calls_by_endpoint[endpoint] = self.calls_by_endpoint.get(endpoint, 0) + 1
+            rate_limited = self.rate_limit_every and self.calls % self.rate_limit_every == 0
+        if self.latency:
+            time.sleep(self.latency)
+        if rate_limited:
+            raise SpotifyException(429, -1, 'API rate limit exceeded',
+                                   headers={'Retry-After': str(self.retry_after)})
+        self.bytes_sent += len(bson.encode({'r': result}))
+        return result
+
+    def _get_playlist(self, playlist_id):
+        if playlist_id not in self.playlists:
+            raise SpotifyException(404, -1, 'Resource not found')
+        return self.playlists[playlist_id]
+
+    def playlist(self, playlist_id, fields=None, **kwargs):
+        tracks = self._get_playlist(playlist_id)
+        snapshot_id = f'{playlist_id}-{self.snapshots[playlist_id]}'
+        if fields == 'snapshot_id':
+            return self._request('playlist', {'snapshot_id': snapshot_id})
+        return self._request('playlist', {
+            'name': f'Playlist {playlist_id}',
+            'owner': {'display_name': 'Benchmark'},
+            'external_urls': {'spotify': f'https://open.spotify.com/playlist/{playlist_id}'},
+            'images': [],
+            'tracks': {'total': len(tracks)},
+            'snapshot_id': snapshot_id,
+        })
+
+    def playlist_items(self, playlist_id, fields=None, limit=100, offset=0, **kwargs):
+        tracks = self._get_playlist(playlist_id)
+        items = [
+            make_local_track(track_id[6:]) if track_id.startswith('local:') else make_track(track_id)
+            for track_id in tracks[offset:offset + limit]
+        ]
+        if fields is None:
+            items = [{**item, 'track': {**item['track'], **UNFILTERED_EXTRAS}} for item in items]
+        next_offset = offset + limit
+        return self._request('playlist_items', {
+            'items': items,
+            'total': len(tracks),
+            'next': f'offset={next_offset}' if next_offset < len(tracks) else None,
+            'offset': offset,
+            'limit': limit,
+        })
+
+    def _find_track(self, track_id):
+        return make_track(track_id)['track']
+
+    def track(self, track_id, **kwargs):
+        return self._request('track', self._find_track(track_id))
+
+    def tracks(self, track_ids, **kwargs):
+        return self._request('tracks', {'tracks': [self._find_track(track_id) for track_id in track_ids]})
+
+class FakeSpotifyAuth:
+    """Auth manager stand-in whose cached token never runs out"""
+
+    def __init__(self):
+        self.cache_handler = self
+
+    def get_cached_token(self):
+        return {'access_token': 'benchmark', 'expires_at': time.time() + 3600}
+
+class FakeSpotifyServer:
+    """Serves a FakeSpotify as a local Spotify Web API over HTTP/1.1 keep-alive.
+
+    `connections` counts TCP connections opened by clients, to see how well
+    they are reused, and `requests` keeps the path, query parameters and
+    Authorization header of every request. FakeSpotify sleeps for its
+    latency, so requests are answered from worker threads.
+    """
+
+    def __init__(self, spotify):
+        self.spotify = spotify
+        self.server = None
+        self.url = None
+        self.connections = 0
+        self.requests = []
+        self.handlers = {}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_connection, '127.0.0.1', 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = f'http://127.0.0.1:{port}/v1/'
+
+    async def stop(self):
+        self.server.close()
+        for writer in self.handlers:
+            writer.close()
+        await asyncio.gather(*self.handlers.values(), return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        self.connections += 1
+        self.handlers[writer] = asyncio.current_task()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split()
+                request_headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    request_headers[name.strip().lower()] = value.strip()
+                status, headers, body = await asyncio.to_thread(self._respond, method, target,
+                                                                request_headers.get('authorization'))
+                lines = [f'HTTP/1.1 {status} X', f'Content-Length: {len(body)}',
+                         'Content-Type: application/json', 'Connection: keep-alive']
+                lines += [f'{name}: {value}' for name, value in headers.items()]
+                writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self.handlers.pop(writer, None)
+            writer.close()
+
+    def _respond(self, method, target, authorization):
+        url = urlsplit(target)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        self.requests.append({'path': url.path, 'query': query, 'authorization': authorization})
+        path = url.path.removeprefix('/v1/').split('/')
+        try:
+            if method != 'GET':
+                raise SpotifyException(405, -1, 'Method not allowed')
+            if len(path) == 2 and path[0] == 'playlists':
+                result = self.spotify.playlist(path[1], fields=query.get('fields'))
+            elif len(path) == 3 and path[0] == 'playlists' and path[2] == 'items':
+                result = self.spotify.playlist_items(path[1], fields=query.get('fields'),
+                                                     limit=int(query.get('limit', 100)),
+                                                     offset=int(query.get('offset', 0)))
+            elif path == ['tracks']:
+                result = self.spotify.tracks(query['ids'].split(','))
+            else:
+                raise SpotifyException(404, -1, 'Service not found')
+        except SpotifyException as e:
+            error = {'error': {'status': e.http_status, 'message': e.msg}}
+            return e.http_status, e.headers or {}, json.dumps(error).encode()
+        return 200, {}, json.dumps(result).encode()
+
+class FakeBot:
+    """Telegram bot stand-in; `flood_every` makes every Nth send raise RetryAfter"""
+
+    def __init__(self, latency=0.0, flood_every=0, retry_after=1):
+        self.latency = latency
+        self.flood_every = flood_every
+        self.retry_after = retry_after
+        self.calls = 0
+        self.sent = []
+        # Photos Telegram had to download from a URL
+        self.photo_downloads = 0
+
+    async def _send(self, kind, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.flood_every and self.calls % self.flood_every == 0:
+            raise RetryAfter(self.retry_after)
+        self.sent.append((kind, kwargs['chat_id']))
+
+    async def send_photo(self, **kwargs):
+        await self._send('photo', **kwargs)
+        photo = kwargs['photo']
+        if photo.startswith('http'):
+            self.photo_downloads += 1
+            photo = f'file-{photo.rsplit("/", 1)[-1]}'
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=photo)])
+
+    async def send_message(self, **kwargs):
+        await self._send('message', **kwargs)
+
+    async def send_media_group(self, **kwargs):
+        await self._send('media_group', **kwargs)
+        messages = []
+        for item in kwargs['media']:
+            photo = item.media
+            if photo.startswith('http'):
+                self.photo_downloads += 1
+                photo = f'file-{photo.rsplit("/", 1)[-1]}'
+            messages.append(SimpleNamespace(photo=[SimpleNamespace(file_id=photo)]))
+        return tuple(messages)
+
+class FakeApplication:
+    """Just enough of telegram.ext.Application for the checker and delivery queue"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    def create_task(self, coroutine):
+        return asyncio.get_running_loop().create_task(coroutine)
+
+# MongoDB stand-in
+
+class FakeCursor(list):
+    def sort(self, key, direction=1):
+        super().sort(key=lambda doc: doc.get(key) or 0, reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        if count:
+            del self[count:]
+        return self
+
+class InsertResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+_MISSING = object()
+
+def _get_path(doc, path):
+    value = doc
+    for part in path.split('.'):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+    return value
+
+def _set_path(doc, path, value):
+    *parents, last = path.split('.')
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+def _unset_path(doc, path):
+    *parents, last = path.split('.')
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+def _matches(doc, query):
+    for path, condition in query.items():
+        value = _get_path(doc, path)
+        if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+            for operator, argument in condition.items():
+                if operator == '$exists':
+                    if (value is not _MISSING) != bool(argument):
+                        return False
+                elif operator == '$ne':
+                    if value is not _MISSING and value == argument:
+                        return False
+                elif operator == '$in':
+                    if value is _MISSING or value not in argument:
+                        return False
+                elif operator == '$gt':
+                    if value is _MISSING or not value > argument:
+                        return False
+                elif operator == '$gte':
+                    if value is _MISSING or not value >= argument:
+                        return False
+                elif operator == '$lt':
+                    if value is _MISSING or not value < argument:
+                        return False
+                elif operator == '$lte':
+                    if value is _MISSING or not value <= argument:
+                        return False
+                else:
+                    raise NotImplementedError(operator)
+        elif value is _MISSING:
+            if condition is not None:
+                return False
+        elif value != condition and not (isinstance(value, list) and condition in value):
+            return False
+    return True
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    result = {}
+    if projection.get('_id', 1) and '_id' in doc:
+        result['_id'] = doc['_id']
+    for path, include in projection.items():
+        if path == '_id' or not include:
+            continue
+        value = _get_path(doc, path)
+        if value is not _MISSING:
+            _set_path(result, path, copy.deepcopy(value))
+    return result
+
+class FakeCollection:
+    """Thread-safe in-memory collection with the pymongo calls the bot uses.
+
+    Documents are kept BSON-encoded, like a real server keeps them, so large
+    playlist states stay small in memory and written bytes are real BSON
+    sizes. Small top-level fields are also kept decoded to match queries
+    without decoding the whole document.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.docs = {}
+        self.headers = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.operations = 0
+        self.bytes_written = 0
+
+    def reset_counters(self):
+        self.operations = 0
+        self.bytes_written = 0
+
+    def _count(self, written=None):
+        self.operations += 1
+        if written is not None:
+            self.bytes_written += len(bson.encode(written))
+
+    def _store(self, doc):
+        self.docs[doc['_id']] = bson.encode(doc)
+        self.headers[doc['_id']] = {
+            key: copy.copy(value) for key, value in doc.items()
+            if not isinstance(value, (dict, list, bytes)) or len(value) <= 32
+        }
+
+    def _load(self, doc_id):
+        return bson.decode(self.docs[doc_id])
+
+    def _candidates(self, query, projection=None):
+        """Yield (doc_id, doc) for matching documents, decoding only when needed"""
+        query_roots = {path.split('.')[0] for path in query}
+        wanted_roots = set(query_roots)
+        if projection:
+            wanted_roots |= {path.split('.')[0] for path, include in projection.items() if include}
+        for doc_id, header in list(self.headers.items()):
+            # Filter on the header first so only matching documents get decoded
+            if all(root in header or root == '_id' for root in query_roots):
+                if not _matches(header, query):
+                    continue
+                if projection and all(root in header or root == '_id' for root in wanted_roots):
+                    yield doc_id, header
+                    continue
+                yield doc_id, self._load(doc_id)
+                continue
+            doc = self._load(doc_id)
+            if _matches(doc, query):
+                yield doc_id, doc
+
+    def create_index(self, keys, **kwargs):
+        self._count()
+        return '_'.join(f'{key}_{direction}' for key, direction in keys)
+
+    def find_one(self, query=None, projection=None):
+        with self.lock:
+            self._count()
+            for doc_id, doc in self._candidates(query or {}, projection):
+                return _project(doc, projection)
+        return None
+
+    def find(self, query=None, projection=None):
+        with self.lock:
+            self._count()
+            return FakeCursor(_project(doc, projection) for doc_id, doc in self._candidates(query or {}, projection))
+
+    def count_documents(self, query):
+        with self.lock:
+            self._count()
+            return sum(1 for _ in self._candidates(query, {'_id': 1}))
+
+    def insert_one(self, document):
+        with self.lock:
+            document.setdefault('_id', next(self.ids))
+            self._count(document)
+            self._store(document)
+            return InsertResult(document['_id'])
+
+    def insert_many(self, documents):
+        for document in documents:
+            self.insert_one(document)
+
+    def _apply(self, doc, update, inserting):
+        for operator, fields in update.items():
+            for path, value in fields.items():
+                if operator == '$set' or (operator == '$setOnInsert' and inserting):
+                    _set_path(doc, path, value)
+                elif operator == '$unset':
+                    _unset_path(doc, path)
+                elif operator == '$inc':
+                    current = _get_path(doc, path)
+                    _set_path(doc, path, (0 if current is _MISSING else current) + value)
+                elif operator == '$addToSet':
+                    current = _get_path(doc, path)
+                    current = [] if current is _MISSING else current
+                    existing = set(current)
+                    for item in value['$each'] if isinstance(value, dict) and '$each' in value else [value]:
+                        if item not in existing:
+                            current.append(item)
+                            existing.add(item)
+                    _set_path(doc, path, current)
+                elif operator == '$pull':
+                    current = _get_path(doc, path)
+                    if current is not _MISSING:
+                        removed = set(value['$in']) if isinstance(value, dict) and '$in' in value else {value}
+                        _set_path(doc, path, [item for item in current if item not in removed])
+                elif operator != '$setOnInsert':
+                    raise NotImplementedError(operator)
+
+    def _update(self, query, update, upsert, many):
+        matched = [doc_id for doc_id, _ in self._candidates(query, {'_id': 1})]
+        if not many:
+            matched = matched[:1]
+        for doc_id in matched:
+            doc = self._load(doc_id)
+            self._apply(doc, update, inserting=False)
+            self._store(doc)
+        if not matched and upsert:
+            doc = {
+                path: value for path, value in query.items()
+                if not (isinstance(value, dict) and any(key.startswith('$') for key in value))
+            }
+            doc.setdefault('_id', next(self.ids))
+            if doc['_id'] in self.docs:
+                raise DuplicateKeyError(f"duplicate key: {doc['_id']}")
+            self._apply(doc, update, inserting=True)
+            self._store(doc)
+            matched = [doc['_id']]
+        return matched
+
+    def update_one(self, query, update, upsert=False):
+        with self.lock:
+            self._count(update)
+            self._update(query, update, upsert, many=False)
+
+    def update_many(self, query, update, upsert=False):
+        with self.lock:
+            self._count(update)
+            self._update(query, update, upsert, many=True)
+
+    def find_one_and_update(self, query, update, upsert=False, projection=None, **kwargs):
+        with self.lock:
+            self._count(update)
+            matched = self._update(query, update, upsert, many=False)
+            return _project(self._load(matched[0]), projection) if matched else None
+
+    def delete_one(self, query):
+        with self.lock:
+            self._count()
+            for doc_id, _ in self._candidates(query, {'_id': 1}):
+                del self.docs[doc_id], self.headers[doc_id]
+                return
+
+    def delete_many(self, query):
+        with self.lock:
+            self._count()
+            for doc_id in [doc_id for doc_id, _ in self._candidates(query, {'_id': 1})]:
+                del self.docs[doc_id], self.headers[doc_id]
+
+    def bulk_write(self, requests, ordered=True):
+        with self.lock:
+            # One round-trip, however many operations it carries
+            self.operations += 1
+            for request in requests:
+                self.bytes_written += len(bson.encode(request._doc))
+                self._update(request._filter, request._doc, request._upsert, many=False)
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name)
+        return self.collections[name]
+
+    def operations(self):
+        return sum(collection.operations for collection in self.collections.values())
+
+    def bytes_written(self):
+        return sum(collection.bytes_written for collection in self.collections.values())
+
+    def reset_counters(self):
+        for collection in self.collections.values():
+            collection.reset_counters()
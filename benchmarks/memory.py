@@ -0,0 +1,59 @@
+"""Memory and diff speed of TrackIdSet against plain sets of track ID strings.
+
+    python -m benchmarks.memory
+    python -m benchmarks.memory --playlists 1000 --tracks 500
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from track_ids import TrackIdSet
+from benchmarks.fakes import random_id
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+def time_diff(previous, current, repeat=5):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        added = current - previous
+        removed = previous - current
+    return (time.perf_counter() - started) / repeat, len(added), len(removed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--playlists', type=int, default=200, help='playlists held in memory')
+    parser.add_argument('--tracks', type=int, default=500, help='tracks per playlist')
+    parser.add_argument('--diff-tracks', type=int, default=10_000, help='playlist size for the diff timing')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # Fresh strings, like the ones decoded from API responses
+    playlists = [[random_id(rng) for _ in range(args.tracks)] for _ in range(args.playlists)]
+    string_sets, string_size = measure(lambda: [set(''.join(list(track_id)) for track_id in ids) for ids in playlists])
+    compact_sets, compact_size = measure(lambda: [TrackIdSet.from_ids(ids) for ids in playlists])
+    assert all(set(compact) == strings for compact, strings in zip(compact_sets, string_sets))
+
+    total_ids = args.playlists * args.tracks
+    print(f"\n📊 {args.playlists} playlists x {args.tracks} tracks ({total_ids} IDs)")
+    print(f"   set of str        {string_size / 1024 / 1024:.1f} MB ({string_size / total_ids:.0f} bytes per ID)")
+    print(f"   TrackIdSet        {compact_size / 1024 / 1024:.1f} MB ({compact_size / total_ids:.0f} bytes per ID)")
+
+    # A check's diff: some tracks removed, some added
+    previous_ids = [random_id(rng) for _ in range(args.diff_tracks)]
+    current_ids = previous_ids[100:] + [random_id(rng) for _ in range(50)]
+    string_time, added, removed = time_diff(set(previous_ids), set(current_ids))
+    compact_time, compact_added, compact_removed = time_diff(
+        TrackIdSet.from_ids(previous_ids), TrackIdSet.from_ids(current_ids)
+    )
+    assert (added, removed) == (compact_added, compact_removed)
+    print(f"\n📊 diff of a {args.diff_tracks}-track playlist ({added} added, {removed} removed)")
+    print(f"   set of str        {string_time * 1000:.2f} ms")
+    print(f"   TrackIdSet        {compact_time * 1000:.2f} ms")
+
+if __name__ == '__main__':
+    main()
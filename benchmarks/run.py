@@ -0,0 +1,170 @@
+"""Offline benchmarks for the playlist checker.
+
+Runs the real checker code from telegram_bot.py against the in-process fakes
+in benchmarks/fakes.py (Spotify behind a local HTTP server) and reports cycle
+time, API call counts, bytes written and peak memory. Run from the repository
+root:
+
+    python -m benchmarks.run                  # all scenarios
+    python -m benchmarks.run --scenario mass_edit --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+import telegram_bot as bot
+from spotify_client import AsyncSpotify
+from spotify_governor import GovernedSpotify, SpotifyGovernor
+from telegram_delivery import AlbumArtCache, NotificationQueue
+from benchmarks.fakes import (FakeApplication, FakeBot, FakeDatabase, FakeSpotify, FakeSpotifyAuth,
+                              FakeSpotifyServer, make_track)
+
+def install_fakes(spotify_server, database, telegram_bot, spotify_rate):
+    """Point telegram_bot at the fakes instead of the real services"""
+    bot.spotify_governor = SpotifyGovernor(rate=spotify_rate, burst=spotify_rate)
+    bot.spotify_client = AsyncSpotify(FakeSpotifyAuth(), base_url=spotify_server.url,
+                                      max_connections=bot.SPOTIFY_MAX_CONNECTIONS)
+    bot.sp = GovernedSpotify(bot.spotify_client, bot.spotify_governor)
+    bot.db = database
+    bot.playlist_collection = database['playlist_state']
+    bot.config_collection = database['bot_config']
+    bot.notification_collection = database['pending_notifications']
+    # Telegram limits are not what's being measured here
+    bot.notification_queue = NotificationQueue(
+        bot.notification_collection, global_rate=100_000, chat_rate=100_000, chat_burst=100_000,
+        album_art=AlbumArtCache(database['album_art_files'])
+    )
+    # Each scenario runs in its own event loop
+    bot.check_semaphore = asyncio.Semaphore(bot.CHECK_CONCURRENCY)
+    bot.checks_in_flight.clear()
+    bot.tracked_chats.clear()
+    bot.tracked_playlists.clear()
+    return FakeApplication(telegram_bot)
+
+def seed(spotify, playlists, tracks_per_playlist, chats_per_playlist, notify_mode=None):
+    """Create playlists on the fake Spotify and subscribe chats the way /setplaylist does"""
+    chat_id = 1000
+    for index in range(playlists):
+        playlist_id = f'playlist{index:05d}'
+        track_ids = spotify.create_playlist(playlist_id, tracks_per_playlist)
+        items = [make_track(track_id) for track_id in track_ids]
+        last_page_start = (len(items) - 1) // bot.PLAYLIST_PAGE_SIZE * bot.PLAYLIST_PAGE_SIZE
+        bot.save_playlist_state(
+            'telegram', playlist_id, track_ids,
+            {item['track']['id']: item for item in items},
+            f'{playlist_id}-{spotify.snapshots[playlist_id]}',
+            bot.playlist_tail(len(items), items[last_page_start:])
+        )
+        for _ in range(chats_per_playlist):
+            bot.save_chat_playlist_id(chat_id, playlist_id)
+            bot.add_playlist_subscriber('telegram', playlist_id, chat_id)
+            if notify_mode:
+                bot.save_chat_notify_mode(chat_id, notify_mode)
+            chat_id += 1
+
+# name -> (description, playlists, tracks per playlist, chats per playlist, edit function)
+SCENARIOS = {
+    'many_chats': (
+        '1k chats x 500 tracks, 5% of playlists edited',
+        1000, 500, 1,
+        lambda spotify: [spotify.add_tracks(playlist_id, 2) for playlist_id in list(spotify.playlists)[::20]],
+    ),
+    'large_playlist': (
+        'one 10k-track playlist, 3 songs added',
+        1, 10_000, 1,
+        lambda spotify: spotify.add_tracks('playlist00000', 3),
+    ),
+    'mass_edit': (
+        'one 2k-track playlist, 300 added + 200 removed, 20 chats',
+        1, 2000, 20,
+        lambda spotify: (spotify.remove_tracks('playlist00000', 200), spotify.add_tracks('playlist00000', 300)),
+    ),
+    'idle': (
+        '1k chats x 500 tracks, nothing changed',
+        1000, 500, 1,
+        lambda spotify: None,
+    ),
+}
+
+async def wait_for_delivery(queue, timeout=300):
+    started = time.monotonic()
+    while (queue.depth() or queue.chat_workers) and time.monotonic() - started < timeout:
+        await asyncio.sleep(0.01)
+    return time.monotonic() - started
+
+async def run_scenario(name, args):
+    description, playlists, tracks_per_playlist, chats_per_playlist, edit = SCENARIOS[name]
+    spotify = FakeSpotify(latency=args.latency, rate_limit_every=args.rate_limit_every)
+    database = FakeDatabase()
+    telegram = FakeBot(latency=args.telegram_latency)
+    spotify_server = FakeSpotifyServer(spotify)
+    await spotify_server.start()
+    application = install_fakes(spotify_server, database, telegram, args.spotify_rate)
+
+    seed(spotify, playlists, tracks_per_playlist, chats_per_playlist, args.notify_mode)
+    bot.load_tracked_playlists()
+    await bot.notification_queue.start(application)
+    edit(spotify)
+    spotify.reset_counters()
+    database.reset_counters()
+
+    if args.memory:
+        tracemalloc.start()
+    started = time.monotonic()
+    await bot.check_all_playlists(application)
+    cycle_time = time.monotonic() - started
+    delivery_time = await wait_for_delivery(bot.notification_queue)
+    peak_memory = tracemalloc.get_traced_memory()[1] if args.memory else None
+    if args.memory:
+        tracemalloc.stop()
+    await bot.spotify_client.aclose()
+    await spotify_server.stop()
+
+    return {
+        'scenario': name,
+        'description': description,
+        'cycle_s': cycle_time,
+        'spotify_calls': spotify.calls,
+        'spotify_calls_by_endpoint': dict(spotify.calls_by_endpoint),
+        'spotify_kb_received': spotify.bytes_sent / 1024,
+        'spotify_connections': spotify_server.connections,
+        'mongo_ops': database.operations(),
+        'mongo_kb_written': database.bytes_written() / 1024,
+        'telegram_calls': telegram.calls,
+        'photo_downloads': telegram.photo_downloads,
+        'delivery_s': delivery_time,
+        'peak_memory_mb': peak_memory / 1024 / 1024 if peak_memory is not None else None,
+    }
+
+def print_result(result):
+    print(f"\n📊 {result['scenario']}: {result['description']}")
+    print(f"   cycle time        {result['cycle_s']:.2f}s")
+    endpoints = ', '.join(f'{endpoint} {count}' for endpoint, count in sorted(result['spotify_calls_by_endpoint'].items()))
+    print(f"   spotify calls     {result['spotify_calls']} ({endpoints})")
+    print(f"   spotify received  {result['spotify_kb_received']:.1f} KB")
+    print(f"   spotify conns     {result['spotify_connections']} (keep-alive connections opened)")
+    print(f"   mongo operations  {result['mongo_ops']}")
+    print(f"   mongo written     {result['mongo_kb_written']:.1f} KB")
+    print(f"   telegram calls    {result['telegram_calls']} (queue drained {result['delivery_s']:.2f}s after the cycle)")
+    print(f"   photo downloads   {result['photo_downloads']} (album art sent by URL rather than file_id)")
+    if result['peak_memory_mb'] is not None:
+        print(f"   peak memory       {result['peak_memory_mb']:.1f} MB (during the cycle)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append',
+                        help='scenario to run (repeatable, default: all)')
+    parser.add_argument('--latency', type=float, default=0.02, help='fake Spotify latency per request in seconds')
+    parser.add_argument('--telegram-latency', type=float, default=0.0, help='fake Telegram latency per send in seconds')
+    parser.add_argument('--rate-limit-every', type=int, default=0, help='make every Nth Spotify request return 429')
+    parser.add_argument('--spotify-rate', type=float, default=1000, help='governor requests per second')
+    parser.add_argument('--notify-mode', choices=bot.NOTIFY_MODES,
+                        help=f'notification mode of every chat (default: {bot.DEFAULT_NOTIFY_MODE})')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip tracemalloc (faster)')
+    args = parser.parse_args()
+
+    for name in args.scenario or SCENARIOS:
+        print_result(asyncio.run(run_scenario(name, args)))
+
+if __name__ == '__main__':
+    main()
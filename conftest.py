@@ -0,0 +1 @@
+# Lets tests import the bot's modules and benchmarks.fakes from the repository root
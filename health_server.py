@@ -0,0 +1,113 @@
+import asyncio
+import hmac
+import json
+
+# Telegram updates are small; anything bigger isn't one
+MAX_BODY_SIZE = 1024 * 1024
+IDLE_TIMEOUT = 60
+
+NO_CACHE = 'no-cache, no-store, must-revalidate'
+
+class HealthServer:
+    """Small asyncio HTTP/1.1 server on the bot's event loop.
+
+    Serves the health check (Render/UptimeRobot) and Prometheus metrics and,
+    in webhook mode, receives Telegram updates on `webhook_path`, all on one
+    port. Connections are kept alive, as Telegram reuses them for updates.
+    """
+
+    def __init__(self, port, metrics=None, webhook_path=None, webhook_secret=None, on_update=None):
+        self.port = port
+        self.metrics = metrics
+        self.webhook_path = webhook_path
+        self.webhook_secret = webhook_secret
+        self.on_update = on_update
+        self.server = None
+        self.connections = set()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_connection, '0.0.0.0', self.port)
+        print(f"✅ Health check server running on port {self.port}")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            # Idle keep-alive connections would otherwise hold up wait_closed()
+            for writer in list(self.connections):
+                writer.close()
+            await self.server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                if not request_line:
+                    break
+                method, path, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                status, content_type, content = await self._route(method, path.split('?')[0], headers, body)
+                await self._respond(writer, status, content_type, content, keep_alive, include_body=method != 'HEAD')
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+    async def _route(self, method, path, headers, body):
+        if self.webhook_path and path == self.webhook_path:
+            if method != 'POST':
+                return 405, None, b''
+            secret = headers.get('x-telegram-bot-api-secret-token', '')
+            if self.webhook_secret and not hmac.compare_digest(secret, self.webhook_secret):
+                return 403, None, b''
+            try:
+                update = json.loads(body)
+            except ValueError:
+                return 400, None, b''
+            try:
+                await self.on_update(update)
+            except Exception as e:
+                # Telegram retries the update after an error response
+                print(f"❌ Error receiving update: {e}")
+                return 500, None, b''
+            return 200, None, b''
+        if method == 'OPTIONS':
+            return 200, None, b''
+        if path in ('/', '/health'):
+            return 200, 'text/plain', b'Bot is running!'
+        if path == '/metrics' and self.metrics:
+            return 200, 'text/plain; version=0.0.4', self.metrics().encode()
+        return 404, None, b''
+
+    async def _respond(self, writer, status, content_type=None, content=b'', keep_alive=True, include_body=True):
+        reasons = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+                   405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+        lines = [
+            f'HTTP/1.1 {status} {reasons.get(status, "")}',
+            f'Content-Length: {len(content)}',
+            f'Cache-Control: {NO_CACHE}',
+            f'Connection: {"keep-alive" if keep_alive else "close"}',
+            'Allow: GET, HEAD, POST, OPTIONS',
+            'Access-Control-Allow-Origin: *',
+        ]
+        if content_type:
+            lines.append(f'Content-Type: {content_type}')
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if include_body:
+            writer.write(content)
+        await writer.drain()
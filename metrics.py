@@ -0,0 +1,80 @@
+import bisect
+import threading
+
+# Every metric created here is rendered by render_metrics()
+registry = []
+
+class Counter:
+    """Monotonic counter. With `func`, the value is read from it at scrape time."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, func=None):
+        self.name = name
+        self.help_text = help_text
+        self.func = func
+        self.value = 0
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self):
+        yield self.name, self.func() if self.func else self.value
+
+class Gauge(Counter):
+    """Value that can go up and down, usually read from `func` at scrape time"""
+
+    kind = 'gauge'
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    """Cumulative histogram with fixed bucket upper bounds (in seconds)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self):
+        with self.lock:
+            counts = list(self.counts)
+            total_sum = self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            yield f'{self.name}_bucket{{le="{bound}"}}', cumulative
+        cumulative += counts[-1]
+        yield f'{self.name}_bucket{{le="+Inf"}}', cumulative
+        yield f'{self.name}_sum', total_sum
+        yield f'{self.name}_count', cumulative
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in registry:
+        lines.append(f'# HELP {metric.name} {metric.help_text}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        try:
+            for sample_name, value in metric.samples():
+                lines.append(f'{sample_name} {value}')
+        except Exception:
+            # A broken callback shouldn't take the whole endpoint down
+            continue
+    return '\n'.join(lines) + '\n'
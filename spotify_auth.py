@@ -1,18 +1,21 @@
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
+from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
+from spotify_tokens import SpotifyTokenStore
 
 load_dotenv()
 
 # Authenticate with Spotify
-sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
+auth_manager = SpotifyOAuth(
     client_id=os.getenv('SPOTIFY_CLIENT_ID'),
     client_secret=os.getenv('SPOTIFY_CLIENT_SECRET'),
     redirect_uri='http://localhost:8888/callback',
     scope='playlist-read-private playlist-read-collaborative',
     cache_path='.spotify_cache'
-))
+)
+sp = spotipy.Spotify(auth_manager=auth_manager)
 
 # Test the authentication
 try:
@@ -21,3 +24,13 @@ try:
     print("Token cached in .spotify_cache file")
 except Exception as e:
     print(f"❌ Authentication failed: {e}")
+    raise SystemExit(1)
+
+# Hand the token to the bot through its token store
+if os.getenv('MONGO_URI'):
+    try:
+        store = SpotifyTokenStore(MongoClient(os.getenv('MONGO_URI'))['spotify_tracker']['bot_config'])
+        store.save(auth_manager.get_cached_token())
+        print("Token saved to MongoDB; the bot will use and refresh it from there")
+    except Exception as e:
+        print(f"⚠️ Failed to save token to MongoDB: {e}")
@@ -0,0 +1,69 @@
+import asyncio
+import httpx
+from spotipy.exceptions import SpotifyException
+from spotify_tokens import seconds_left
+
+API_URL = 'https://api.spotify.com/v1/'
+
+class AsyncSpotify:
+    """Minimal asyncio client for the Spotify Web API endpoints the bot uses.
+
+    Method names and arguments follow spotipy, and errors are raised as
+    spotipy's SpotifyException, so SpotifyGovernor and the callers' error
+    handling work unchanged. Requests share a pool of HTTP/1.1 keep-alive
+    connections (at most `max_connections`, idle ones closed after
+    `keepalive_expiry` seconds). Tokens come from `auth_manager`'s cache
+    handler; only when one is about to expire is the (blocking) refresh run
+    in a worker thread.
+    """
+
+    def __init__(self, auth_manager, base_url=API_URL, max_connections=10, keepalive_expiry=30, timeout=10):
+        self.auth_manager = auth_manager
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            # The pool limits go on the transport: AsyncClient ignores `limits` when given one.
+            # Only connection failures are retried here; 429s and 5xx go to the governor
+            transport=httpx.AsyncHTTPTransport(
+                retries=3,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                    keepalive_expiry=keepalive_expiry
+                )
+            )
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _access_token(self):
+        token_info = self.auth_manager.cache_handler.get_cached_token()
+        if token_info and seconds_left(token_info) > 60:
+            return token_info['access_token']
+        return await asyncio.to_thread(self.auth_manager.get_access_token, as_dict=False)
+
+    async def _get(self, path, **params):
+        params = {name: value for name, value in params.items() if value is not None}
+        response = await self.client.get(
+            path,
+            params=params,
+            headers={'Authorization': f'Bearer {await self._access_token()}'}
+        )
+        if response.status_code >= 400:
+            try:
+                message = response.json()['error']['message']
+            except (ValueError, KeyError, TypeError):
+                message = 'error'
+            raise SpotifyException(response.status_code, -1, f'{response.url}:\n {message}',
+                                   reason=response.reason_phrase, headers=response.headers)
+        return response.json()
+
+    async def playlist(self, playlist_id, fields=None):
+        return await self._get(f'playlists/{playlist_id}', fields=fields)
+
+    async def playlist_items(self, playlist_id, fields=None, limit=100, offset=0):
+        return await self._get(f'playlists/{playlist_id}/items', fields=fields, limit=limit, offset=offset)
+
+    async def tracks(self, track_ids):
+        return await self._get('tracks', ids=','.join(track_ids))
@@ -0,0 +1,157 @@
+import asyncio
+import contextlib
+import contextvars
+import time
+import httpx
+from spotipy.exceptions import SpotifyException
+
+# Call priorities: user commands go before the background checker
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Priority of Spotify calls made from the current context. Tasks copy the
+# context, so a priority set in a command handler follows its calls into the
+# tasks it starts (like prefetched playlist pages).
+spotify_priority = contextvars.ContextVar('spotify_priority', default=BACKGROUND)
+
+class SpotifyUnavailable(Exception):
+    """Raised instead of calling Spotify while the circuit breaker is open"""
+
+class SpotifyGovernor:
+    """Coordinates every Spotify API call made by the bot.
+
+    - Token bucket: at most `rate` requests per second (bursts up to `burst`)
+    - 429 responses pause all callers for Retry-After seconds, then retry
+    - `failure_threshold` failures in a row open the circuit for
+      `reset_timeout` seconds; calls fail fast with SpotifyUnavailable
+    - Background callers wait while interactive callers are queued
+
+    All calls are coroutines awaited on the bot's event loop, so the state
+    needs no locking.
+    """
+
+    def __init__(self, rate=5, burst=10, max_retries=3, failure_threshold=5, reset_timeout=60):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.interactive_waiting = 0
+        self.consecutive_failures = 0
+        self.circuit_open_until = 0
+        self.calls = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    @contextlib.contextmanager
+    def priority(self, priority):
+        """Run the Spotify calls made inside the block at the given priority"""
+        token = spotify_priority.set(priority)
+        try:
+            yield
+        finally:
+            spotify_priority.reset(token)
+
+    def pause(self, seconds):
+        """Stop all callers for `seconds` seconds (Retry-After)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _try_acquire(self, priority):
+        """Take a token, or return how long to wait before trying again"""
+        now = time.monotonic()
+        if now < self.circuit_open_until:
+            raise SpotifyUnavailable(
+                f"Spotify is unavailable, retrying in {int(self.circuit_open_until - now) + 1}s"
+            )
+        if now < self.paused_until:
+            return self.paused_until - now
+        if priority != INTERACTIVE and self.interactive_waiting:
+            return 1 / self.rate
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.calls += 1
+            return None
+        return (1 - self.tokens) / self.rate
+
+    async def _acquire(self, priority):
+        if priority == INTERACTIVE:
+            self.interactive_waiting += 1
+        try:
+            while True:
+                wait = self._try_acquire(priority)
+                if wait is None:
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            if priority == INTERACTIVE:
+                self.interactive_waiting -= 1
+
+    def _record(self, failed):
+        if not failed:
+            self.consecutive_failures = 0
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self.circuit_open_until = time.monotonic() + self.reset_timeout
+            # Half-open afterwards: one more failure re-opens the circuit
+            self.consecutive_failures = self.failure_threshold - 1
+            print(f"⚠️ Spotify circuit open for {self.reset_timeout}s after repeated failures")
+
+    def _retry_delay(self, error, attempt):
+        """Seconds to wait before retrying after a SpotifyException, or None to give up"""
+        if error.http_status == 429:
+            self.rate_limited += 1
+            retry_after = int((error.headers or {}).get('Retry-After', 2 ** attempt))
+            self.pause(retry_after)
+            if attempt < self.max_retries:
+                # The pause already makes the retry wait
+                return 0
+            self._record(failed=True)
+        elif error.http_status and error.http_status >= 500:
+            self._record(failed=True)
+            if attempt < self.max_retries:
+                return 0.5 * 2 ** attempt
+        else:
+            # Client errors (404 etc.) mean Spotify itself is fine
+            self._record(failed=False)
+        return None
+
+    async def call(self, func, *args, **kwargs):
+        """Await a Spotify API coroutine function under the governor's rules"""
+        priority = spotify_priority.get()
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority)
+            try:
+                result = await func(*args, **kwargs)
+            except SpotifyException as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except httpx.HTTPError:
+                self._record(failed=True)
+                raise
+            self._record(failed=False)
+            return result
+
+class GovernedSpotify:
+    """Wraps an AsyncSpotify client so every API method goes through a governor"""
+
+    def __init__(self, client, governor):
+        self._client = client
+        self._governor = governor
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+        async def governed(*args, **kwargs):
+            return await self._governor.call(attribute, *args, **kwargs)
+        return governed
@@ -0,0 +1,120 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from spotipy.oauth2 import SpotifyOAuth
+
+# Refreshes in other processes that take longer than this are assumed dead
+REFRESH_LOCK_TIMEOUT = 30
+NEVER = datetime(1970, 1, 1)
+
+def seconds_left(token_info):
+    return token_info['expires_at'] - time.time()
+
+class SpotifyTokenStore:
+    """Spotify token kept in a MongoDB collection (bot_config), shared by every process.
+
+    The same document holds a refresh lock so that only one process at a
+    time asks Spotify for a new token.
+    """
+
+    TOKEN_ID = 'spotify_token'
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def load(self):
+        doc = self.collection.find_one({'_id': self.TOKEN_ID}, {'_id': 0, 'token_info': 1})
+        return doc.get('token_info') if doc else None
+
+    def save(self, token_info):
+        self.collection.update_one(
+            {'_id': self.TOKEN_ID},
+            {
+                '$set': {'platform': 'spotify', 'setting': 'token', 'token_info': token_info,
+                         'updated_at': datetime.utcnow()},
+                '$setOnInsert': {'refresh_locked_until': NEVER}
+            },
+            upsert=True
+        )
+
+    def acquire_refresh_lock(self):
+        """Take the refresh lock; False if another process holds it"""
+        now = datetime.utcnow()
+        try:
+            # Upserting while the lock is held collides with the existing _id
+            self.collection.find_one_and_update(
+                {'_id': self.TOKEN_ID, 'refresh_locked_until': {'$lt': now}},
+                {'$set': {'refresh_locked_until': now + timedelta(seconds=REFRESH_LOCK_TIMEOUT)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def release_refresh_lock(self):
+        self.collection.update_one({'_id': self.TOKEN_ID}, {'$set': {'refresh_locked_until': NEVER}})
+
+class SharedSpotifyOAuth(SpotifyOAuth):
+    """SpotifyOAuth whose refreshes are single-flight across threads and processes.
+
+    Callers that find the token expiring wait for the refresh already in
+    progress (here or in another process, through the store's lock) and reuse
+    its result instead of refreshing again. `cache_handler.store` is the
+    SpotifyTokenStore, or None to coordinate within this process only.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.refresh_lock = threading.Lock()
+        self.refreshes = 0
+
+    def refresh_access_token(self, refresh_token):
+        # spotipy calls this when the token has less than a minute left
+        return self.refresh_if_expiring(60, refresh_token)
+
+    def refresh_if_expiring(self, margin, refresh_token=None):
+        """Make sure the cached token is valid for at least `margin` more seconds"""
+        with self.refresh_lock:
+            token_info = self.cache_handler.get_cached_token()
+            if token_info and seconds_left(token_info) > margin:
+                # Refreshed by another thread while this one waited for the lock
+                return token_info
+            refresh_token = refresh_token or (token_info or {}).get('refresh_token')
+            store = self.cache_handler.store
+            if store is None:
+                return self._refresh(refresh_token)
+
+            stored = self._adopt_stored(margin)
+            if stored:
+                return stored
+            if store.acquire_refresh_lock():
+                try:
+                    return self._refresh(refresh_token)
+                finally:
+                    store.release_refresh_lock()
+
+            # Another process is refreshing right now
+            if token_info and seconds_left(token_info) > 60:
+                return token_info
+            deadline = time.monotonic() + REFRESH_LOCK_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(0.5)
+                stored = self._adopt_stored(60)
+                if stored:
+                    return stored
+            return self._refresh(refresh_token)
+
+    def _adopt_stored(self, margin):
+        """Use the stored token if another process refreshed it recently enough"""
+        stored = self.cache_handler.store.load()
+        if stored and seconds_left(stored) > margin:
+            self.cache_handler.token_data = stored
+            return stored
+        return None
+
+    def _refresh(self, refresh_token):
+        token_info = super().refresh_access_token(refresh_token)
+        self.refreshes += 1
+        print("🔑 Refreshed Spotify access token")
+        return token_info
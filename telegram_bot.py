@@ -1,98 +1,64 @@
 import asyncio
+import functools
+import hashlib
 import threading
 import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, ContextTypes
 from telegram.constants import ParseMode
+from telegram.helpers import escape_markdown
 import spotipy
-from spotipy.oauth2 import SpotifyOAuth
 from spotipy.cache_handler import CacheHandler
 import os
 from dotenv import load_dotenv
-import asyncio
-from pymongo import MongoClient
+from collections import deque
+from pymongo import MongoClient, UpdateOne, monitoring
+import bson
 from datetime import datetime
 import json
+import random
 import re
+import signal
 import warnings
 from telegram.ext import JobQueue
-
-# Keep service alive (Render specific)
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from threading import Thread
-
-class HealthCheckHandler(BaseHTTPRequestHandler):
-    """Health check endpoint for Render/UptimeRobot"""
-    
-    def do_GET(self):
-        """Handle GET requests"""
-        if self.path in ['/', '/health']:
-            self.send_response(200)
-            self.send_header('Content-type', 'text/plain')
-            self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-            self.send_header('Content-Length', '15')
-            self.end_headers()
-            self.wfile.write(b'Bot is running!')
-        else:
-            self.send_response(404)
-            self.end_headers()
-    
-    def do_HEAD(self):
-        """Handle HEAD requests (used by some monitoring services)"""
-        if self.path in ['/', '/health']:
-            self.send_response(200)
-            self.send_header('Content-type', 'text/plain')
-            self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-            self.send_header('Content-Length', '15')
-            self.end_headers()
-        else:
-            self.send_response(404)
-            self.end_headers()
-    
-    def do_POST(self):
-        """Handle POST requests"""
-        self.do_GET()
-    
-    def do_OPTIONS(self):
-        """Handle OPTIONS requests (CORS preflight)"""
-        self.send_response(200)
-        self.send_header('Allow', 'GET, HEAD, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, HEAD, POST, OPTIONS')
-        self.end_headers()
-    
-    def log_message(self, format, *args):
-        """Suppress HTTP access logs"""
-        pass
-
-def run_health_server():
-    """Start health check server"""
-    port = int(os.getenv('PORT', 10000))
-    server = HTTPServer(('0.0.0.0', port), HealthCheckHandler)
-    print(f"✅ Health check server running on port {port}")
-    server.serve_forever()
-
-# Start health server thread
-health_thread = Thread(target=run_health_server, daemon=True)
-health_thread.start()
-print("✅ Health server started")
+from telegram_delivery import AlbumArtCache, NotificationOutbox, NotificationQueue
+from spotify_governor import GovernedSpotify, SpotifyGovernor, INTERACTIVE
+from spotify_client import AsyncSpotify
+from metrics import Counter, Gauge, Histogram, render_metrics
+from health_server import HealthServer
+from telegram.error import TelegramError
+from ttl_cache import TTLCache
+from worker_leases import PartitionLeases, partition_of
+from spotify_tokens import SharedSpotifyOAuth, SpotifyTokenStore, seconds_left
+from track_ids import TrackIdSet
 
 warnings.filterwarnings('ignore')
 load_dotenv()
 
-# MongoDB setup
-MONGO_URI = os.getenv('MONGO_URI')
-mongo_client = MongoClient(MONGO_URI)
-db = mongo_client['spotify_tracker']
-playlist_collection = db['playlist_state']
-config_collection = db['bot_config']
-
-print("✅ Connected to MongoDB")
+# MongoDB, Spotify and the notification queue are set up by init_services()
+# when the bot starts, so importing this module has no side effects
+mongo_client = None
+db = None
+playlist_collection = None
+config_collection = None
+notification_collection = None
+cache_handler = None
+spotify_auth = None
+spotify_client = None
+sp = None
+notification_queue = None
 
 # Custom cache handler
 class EnvironmentCacheHandler(CacheHandler):
-    def __init__(self):
+    """Spotify token from SPOTIFY_TOKEN_DATA or, if newer, the shared token store.
+    
+    Refreshed tokens are saved to the store so restarts and other processes
+    pick them up instead of refreshing again.
+    """
+    
+    def __init__(self, store=None):
         self.token_data = None
+        self.store = store
         token_env = os.getenv('SPOTIFY_TOKEN_DATA')
         if token_env:
             try:
@@ -100,26 +66,229 @@ class EnvironmentCacheHandler(CacheHandler):
                 print("✅ Loaded Spotify token from environment")
             except Exception as e:
                 print(f"⚠️ Failed to parse token: {e}")
+        if store:
+            try:
+                stored = store.load()
+            except Exception as e:
+                stored = None
+                print(f"⚠️ Failed to load stored Spotify token: {e}")
+            if stored and (not self.token_data or stored['expires_at'] > self.token_data.get('expires_at', 0)):
+                self.token_data = stored
+                print("✅ Loaded Spotify token from database")
     
     def get_cached_token(self):
         return self.token_data
     
     def save_token_to_cache(self, token_info):
         self.token_data = token_info
+        if self.store:
+            try:
+                self.store.save(token_info)
+            except Exception as e:
+                # The token still works from memory
+                print(f"⚠️ Failed to save Spotify token: {e}")
+
+# The access token is refreshed in the background once it has less than
+# TOKEN_REFRESH_MARGIN seconds left, so API calls never wait for a refresh
+TOKEN_REFRESH_MARGIN = int(os.getenv('TOKEN_REFRESH_MARGIN', 300))
+TOKEN_REFRESH_CHECK = 60
+
+# Every Spotify call goes through one governor (rate limit, Retry-After,
+# circuit breaker, command priority)
+spotify_governor = SpotifyGovernor(
+    rate=float(os.getenv('SPOTIFY_RATE', 5)),
+    burst=int(os.getenv('SPOTIFY_BURST', 10)),
+    failure_threshold=int(os.getenv('SPOTIFY_FAILURE_THRESHOLD', 5)),
+    reset_timeout=int(os.getenv('SPOTIFY_CIRCUIT_RESET', 60))
+)
+
+# Spotify requests are made on the event loop over a shared pool of
+# keep-alive connections
+SPOTIFY_MAX_CONNECTIONS = int(os.getenv('SPOTIFY_MAX_CONNECTIONS', 10))
+SPOTIFY_KEEPALIVE_EXPIRY = float(os.getenv('SPOTIFY_KEEPALIVE_EXPIRY', 30))
+SPOTIFY_TIMEOUT = float(os.getenv('SPOTIFY_TIMEOUT', 10))
+
+# Health checks, /metrics and (in webhook mode) Telegram updates share PORT
+PORT = int(os.getenv('PORT', 10000))
+# Set WEBHOOK_URL (the bot's public https:// base URL) to have Telegram push
+# updates instead of the bot polling for them. Polling is used otherwise, or
+# if the webhook can't be set.
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '').rstrip('/')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+
+# BOT_MODE picks what this process does:
+# - all: everything in one process (default)
+# - frontend: Telegram commands and notification delivery, no checking
+# - worker: checks a share of the playlists; any number of workers can run
+#   against the same MongoDB and split the playlists through leases
+BOT_MODE = os.getenv('BOT_MODE', 'all')
+CHECK_PARTITIONS = int(os.getenv('CHECK_PARTITIONS', 64))
+LEASE_TTL = int(os.getenv('LEASE_TTL', 60))
+LEASE_RENEW = int(os.getenv('LEASE_RENEW', 15))
+OUTBOX_POLL = float(os.getenv('OUTBOX_POLL', 2))
+# Workers serve health checks and /metrics on WORKER_PORT rather than PORT, so
+# several can run on one host; without it they run no health server
+WORKER_PORT = int(os.getenv('WORKER_PORT', 0)) or None
+worker_leases = None
 
-# Initialize Spotify client
-cache_handler = EnvironmentCacheHandler()
-sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-    client_id=os.getenv('SPOTIFY_CLIENT_ID'),
-    client_secret=os.getenv('SPOTIFY_CLIENT_SECRET'),
-    redirect_uri='http://127.0.0.1:8888/callback',
-    scope='playlist-read-private playlist-read-collaborative',
-    cache_handler=cache_handler,
-    open_browser=False
-))
-
-# Store tracked chats
+# Store tracked chats (chat_id -> chosen playlist) and tracked playlists
+# (playlist_id -> shared track state and the chats subscribed to it)
 tracked_chats = {}
+tracked_playlists = {}
+
+# How many playlists the background checker works on at the same time
+CHECK_CONCURRENCY = max(1, int(os.getenv('CHECK_CONCURRENCY', 8)))
+check_semaphore = asyncio.Semaphore(CHECK_CONCURRENCY)
+# Checks queued, running or waiting for their cycle's state writes to be saved
+# (playlist_id -> {'result': future, 'started': bool, 'state_writes': list,
+# 'saved': event set once those writes are saved}), so a playlist is never
+# checked twice at the same time and a forced check can't save its state
+# before an older check's buffered writes
+checks_in_flight = {}
+
+# /forcecheck within this many seconds of the chat's last one answers with
+# the result of the playlist's most recent check instead of checking again
+FORCE_CHECK_COOLDOWN = int(os.getenv('FORCE_CHECK_COOLDOWN', 60))
+last_force_checks = {}
+
+# Adaptive polling: every playlist starts at CHECK_INTERVAL seconds, polls
+# faster while it keeps changing and backs off towards MAX_CHECK_INTERVAL
+# while it stays the same. The scheduler looks for due playlists every
+# SCHEDULER_TICK seconds.
+CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', 120))
+MIN_CHECK_INTERVAL = int(os.getenv('MIN_CHECK_INTERVAL', 60))
+MAX_CHECK_INTERVAL = int(os.getenv('MAX_CHECK_INTERVAL', 1800))
+CHECK_BACKOFF = 1.5
+SCHEDULER_TICK = int(os.getenv('SCHEDULER_TICK', 10))
+
+# Outbound Telegram notifications: messages per second across all chats,
+# and messages per minute to a single chat (Telegram's group limit is 20)
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 25))
+TELEGRAM_CHAT_RATE_PER_MINUTE = float(os.getenv('TELEGRAM_CHAT_RATE_PER_MINUTE', 20))
+
+# Chats pick how changes are posted with /notifymode: a message per song,
+# a digest (one album of up to 10 covers, or pages of text), or "auto", which
+# switches to a digest when a check finds more than DIGEST_THRESHOLD changes
+NOTIFY_MODES = ('per-song', 'digest', 'auto')
+DEFAULT_NOTIFY_MODE = os.getenv('DEFAULT_NOTIFY_MODE', 'auto')
+DIGEST_THRESHOLD = int(os.getenv('DIGEST_THRESHOLD', 5))
+DIGEST_PAGE_SIZE = int(os.getenv('DIGEST_PAGE_SIZE', 50))
+MEDIA_GROUP_SIZE = 10
+# Telegram's limit is 4096 characters; leave room for the page header
+DIGEST_PAGE_CHARS = 3800
+
+# Album art is uploaded to Telegram once per cover and then sent by file_id
+ALBUM_ART_CACHE_SIZE = int(os.getenv('ALBUM_ART_CACHE_SIZE', 5000))
+ALBUM_ART_CACHE_TTL = 30 * 24 * 3600
+
+# Playlist metadata and track lists fetched for /status and /setplaylist are
+# kept for PLAYLIST_CACHE_TTL seconds, so repeated commands answer from memory.
+# The checker drops a playlist's entries as soon as it sees a new snapshot.
+PLAYLIST_CACHE_TTL = int(os.getenv('PLAYLIST_CACHE_TTL', 300))
+playlist_info_cache = TTLCache(maxsize=int(os.getenv('PLAYLIST_CACHE_SIZE', 512)), ttl=PLAYLIST_CACHE_TTL)
+# Track lists are big, so only a few are kept
+playlist_tracks_cache = TTLCache(maxsize=int(os.getenv('PLAYLIST_TRACKS_CACHE_SIZE', 16)), ttl=PLAYLIST_CACHE_TTL)
+
+# Metrics served on /metrics. Most values are read from the objects that
+# already count them when Prometheus scrapes, so the hot path stays cheap.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CHECK_CYCLE_SECONDS = Histogram('check_cycle_seconds', 'Wall time of a playlist check cycle', LATENCY_BUCKETS)
+PLAYLIST_CHECK_SECONDS = Histogram('playlist_check_seconds', 'Time to check a single playlist', LATENCY_BUCKETS)
+PLAYLIST_CHECK_ERRORS = Counter('playlist_check_errors_total', 'Playlist checks that failed')
+MONGO_COMMANDS = Counter('mongo_commands_total', 'MongoDB commands sent')
+MONGO_ERRORS = Counter('mongo_command_errors_total', 'MongoDB commands that failed')
+Counter('spotify_requests_total', 'Spotify API requests made', lambda: spotify_governor.calls)
+Counter('spotify_errors_total', 'Spotify API requests that failed', lambda: spotify_governor.failures)
+Counter('spotify_rate_limited_total', 'Spotify 429 responses', lambda: spotify_governor.rate_limited)
+Counter('telegram_messages_sent_total', 'Notifications delivered to Telegram',
+        lambda: notification_queue.sent if notification_queue else 0)
+Counter('telegram_send_errors_total', 'Notifications Telegram did not accept',
+        lambda: notification_queue.failed if notification_queue else 0)
+Counter('telegram_rate_limited_total', 'Telegram RetryAfter responses',
+        lambda: notification_queue.rate_limited if notification_queue else 0)
+Gauge('notification_queue_depth', 'Notifications waiting to be sent',
+      lambda: notification_queue.depth() if notification_queue else 0)
+Gauge('tracked_chats', 'Chats tracking a playlist', lambda: len(tracked_chats))
+Gauge('tracked_playlists', 'Playlists with at least one subscribed chat',
+      lambda: sum(1 for state in list(tracked_playlists.values()) if state['subscribers']))
+Counter('playlist_cache_hits_total', 'Playlist metadata/track list lookups answered from the cache',
+        lambda: playlist_info_cache.hits + playlist_tracks_cache.hits)
+Counter('playlist_cache_misses_total', 'Playlist metadata/track list lookups that went to Spotify',
+        lambda: playlist_info_cache.misses + playlist_tracks_cache.misses)
+Gauge('owned_partitions', 'Playlist partitions leased by this worker',
+      lambda: len(worker_leases.owned) if worker_leases else CHECK_PARTITIONS)
+Counter('spotify_token_refreshes_total', 'Spotify access token refreshes made by this process',
+        lambda: spotify_auth.refreshes)
+Counter('album_art_cache_hits_total', 'Album covers sent by cached Telegram file_id',
+        lambda: notification_queue.album_art.file_ids.hits if getattr(notification_queue, 'album_art', None) else 0)
+Counter('album_art_cache_misses_total', 'Album covers Telegram had to download from the URL',
+        lambda: notification_queue.album_art.file_ids.misses if getattr(notification_queue, 'album_art', None) else 0)
+Gauge('checker_lag_seconds', 'How long the most overdue playlist check has been waiting', lambda: checker_lag())
+
+def checker_lag():
+    """Seconds the most overdue subscribed playlist is past its next check"""
+    if BOT_MODE == 'frontend':
+        # The front end doesn't check; its workers report their own lag
+        return 0
+    now = time.monotonic()
+    overdue = [now - state['next_check'] for state in list(tracked_playlists.values()) if state['subscribers']]
+    return max(0, max(overdue, default=0))
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Counts MongoDB commands and failures"""
+    
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        MONGO_COMMANDS.inc()
+    
+    def failed(self, event):
+        MONGO_COMMANDS.inc()
+        MONGO_ERRORS.inc()
+
+def init_services():
+    """Connect to MongoDB and create the Spotify client and notification queue"""
+    global mongo_client, db, playlist_collection, config_collection, notification_collection
+    global cache_handler, spotify_auth, spotify_client, sp, notification_queue, worker_leases
+    
+    # MongoDB setup
+    mongo_client = MongoClient(os.getenv('MONGO_URI'), event_listeners=[MongoCommandMetrics()])
+    db = mongo_client['spotify_tracker']
+    playlist_collection = db['playlist_state']
+    config_collection = db['bot_config']
+    notification_collection = db['pending_notifications']
+    print("✅ Connected to MongoDB")
+    
+    # Initialize Spotify client
+    cache_handler = EnvironmentCacheHandler(SpotifyTokenStore(config_collection))
+    spotify_auth = SharedSpotifyOAuth(
+        client_id=os.getenv('SPOTIFY_CLIENT_ID'),
+        client_secret=os.getenv('SPOTIFY_CLIENT_SECRET'),
+        redirect_uri='http://127.0.0.1:8888/callback',
+        scope='playlist-read-private playlist-read-collaborative',
+        cache_handler=cache_handler,
+        open_browser=False
+    )
+    spotify_client = AsyncSpotify(
+        spotify_auth,
+        max_connections=SPOTIFY_MAX_CONNECTIONS,
+        keepalive_expiry=SPOTIFY_KEEPALIVE_EXPIRY,
+        timeout=SPOTIFY_TIMEOUT
+    )
+    sp = GovernedSpotify(spotify_client, spotify_governor)
+    
+    if BOT_MODE == 'worker':
+        # Workers hand notifications to the front end through MongoDB
+        notification_queue = NotificationOutbox(notification_collection)
+        worker_leases = PartitionLeases(db['checker_leases'], partitions=CHECK_PARTITIONS, ttl=LEASE_TTL)
+    else:
+        notification_queue = NotificationQueue(
+            notification_collection,
+            global_rate=TELEGRAM_GLOBAL_RATE,
+            chat_rate=TELEGRAM_CHAT_RATE_PER_MINUTE / 60,
+            album_art=AlbumArtCache(db['album_art_files'], maxsize=ALBUM_ART_CACHE_SIZE, ttl=ALBUM_ART_CACHE_TTL)
+        )
 
 # Helper functions
 def extract_playlist_id(playlist_input):
@@ -134,11 +303,10 @@ def extract_playlist_id(playlist_input):
 
 def get_chat_playlist_id(chat_id):
     """Get playlist ID for specific chat"""
-    config = config_collection.find_one({
-        'platform': 'telegram',
-        'chat_id': chat_id,
-        'setting': 'playlist_id'
-    })
+    config = config_collection.find_one(
+        {'platform': 'telegram', 'chat_id': chat_id, 'setting': 'playlist_id'},
+        {'_id': 0, 'playlist_id': 1}
+    )
     return config['playlist_id'] if config else None
 
 def save_chat_playlist_id(chat_id, playlist_id):
@@ -157,47 +325,567 @@ def save_chat_playlist_id(chat_id, playlist_id):
         upsert=True
     )
 
-def get_playlist_tracks(playlist_id):
+# Only ask Spotify for the track fields we store, at the largest page size
+PLAYLIST_PAGE_SIZE = 100
+PLAYLIST_TRACK_FIELDS = 'total,items(track(id,name,artists(name),album(name,images(url)),external_urls(spotify),duration_ms))'
+
+# Playlists that only grew at the end are checked by fetching just the new
+# tail pages. Every FULL_FETCH_EVERY tail checks a full fetch catches the
+# edits a tail check can't see (like a song replaced in the middle).
+FULL_FETCH_EVERY = int(os.getenv('FULL_FETCH_EVERY', 10))
+
+# Pages fetched in parallel once the playlist size is known (per playlist fetch)
+PAGE_FETCH_CONCURRENCY = max(1, int(os.getenv('PAGE_FETCH_CONCURRENCY', 4)))
+
+async def get_playlist_page(playlist_id, offset):
+    """Fetch one field-filtered page of playlist items"""
+    return await sp.playlist_items(playlist_id, fields=PLAYLIST_TRACK_FIELDS, limit=PLAYLIST_PAGE_SIZE, offset=offset)
+
+async def iter_playlist_track_pages(playlist_id, first_offset=0, first_page=None):
+    """Yield a playlist's items page by page, in order, from first_offset on.
+    
+    The first page tells us the total; the remaining pages are then fetched
+    in parallel, at most PAGE_FETCH_CONCURRENCY ahead of the consumer.
+    """
+    if first_page is None:
+        first_page = await get_playlist_page(playlist_id, first_offset)
+    yield first_page['items']
+    
+    offsets = iter(range(first_offset + PLAYLIST_PAGE_SIZE, first_page['total'], PLAYLIST_PAGE_SIZE))
+    # Tasks copy the current context, so pages keep the caller's Spotify priority
+    pending = deque()
+    try:
+        for offset in offsets:
+            pending.append(asyncio.ensure_future(get_playlist_page(playlist_id, offset)))
+            if len(pending) >= PAGE_FETCH_CONCURRENCY:
+                break
+        while pending:
+            page = await pending.popleft()
+            offset = next(offsets, None)
+            if offset is not None:
+                pending.append(asyncio.ensure_future(get_playlist_page(playlist_id, offset)))
+            yield page['items']
+    finally:
+        # The consumer stopped early or a page failed
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+async def get_playlist_tracks(playlist_id):
     """Fetch all tracks from a playlist"""
-    results = sp.playlist_items(playlist_id)
-    tracks = results['items']
-    while results['next']:
-        results = sp.next(results)
-        tracks.extend(results['items'])
+    return [item async for page in iter_playlist_track_pages(playlist_id) for item in page]
+
+def item_track_id(item):
+    """Track ID of a playlist item, or None for removed tracks and local files"""
+    return (item['track'] or {}).get('id')
+
+def playlist_tail(total, last_page):
+    """Total and a fingerprint of the last page, to tell later whether the playlist only grew"""
+    track_ids = '\n'.join(item_track_id(item) or '' for item in last_page)
+    return {'total': total, 'fingerprint': hashlib.blake2b(track_ids.encode(), digest_size=8).hexdigest()}
+
+async def fetch_current_tracks(playlist_id):
+    """Fetch a playlist's current tracks keyed by track ID, plus its tail.
+    
+    Pages are consumed as they arrive.
+    """
+    current_tracks = {}
+    total = 0
+    last_page = []
+    async for page in iter_playlist_track_pages(playlist_id):
+        for item in page:
+            if item_track_id(item):
+                current_tracks[item_track_id(item)] = item
+        total += len(page)
+        last_page = page
+    return current_tracks, playlist_tail(total, last_page)
+
+async def get_appended_tracks(playlist_id, tail):
+    """Fetch only the items added at the end since `tail` was taken.
+    
+    Returns (appended items without local files, new tail), or None when the
+    playlist didn't just grow (it shrank, kept its size or its old last page
+    changed) and needs a full fetch. Usually costs a single request.
+    """
+    total = tail['total']
+    last_offset = (total - 1) // PLAYLIST_PAGE_SIZE * PLAYLIST_PAGE_SIZE if total else 0
+    first_page = await get_playlist_page(playlist_id, last_offset)
+    if first_page['total'] <= total:
+        return None
+    if playlist_tail(total, first_page['items'][:total - last_offset]) != tail:
+        return None
+    
+    items = []
+    last_page = []
+    async for page in iter_playlist_track_pages(playlist_id, last_offset, first_page):
+        items.extend(page)
+        last_page = page
+    appended = [item for item in items[total - last_offset:] if item_track_id(item)]
+    return appended, playlist_tail(last_offset + len(items), last_page)
+
+async def get_playlist_info(playlist_id):
+    """Get playlist metadata (cached for PLAYLIST_CACHE_TTL seconds).
+    
+    check_playlist drops the cached entry when the snapshot changes. With
+    BOT_MODE=frontend the checks run in the workers, so nothing does and
+    /status can be up to PLAYLIST_CACHE_TTL seconds out of date.
+    """
+    playlist_info = playlist_info_cache.get(playlist_id)
+    if playlist_info is None:
+        playlist_info = await sp.playlist(playlist_id, fields='name,owner.display_name,external_urls,images,tracks.total,snapshot_id')
+        playlist_info_cache.put(playlist_id, playlist_info)
+    return playlist_info
+
+async def get_cached_current_tracks(playlist_id, snapshot_id):
+    """Like fetch_current_tracks, but reuses a track list fetched for the same snapshot"""
+    cached = playlist_tracks_cache.get(playlist_id)
+    if cached is not None and snapshot_id and cached[0] == snapshot_id:
+        return cached[1]
+    current = await fetch_current_tracks(playlist_id)
+    playlist_tracks_cache.put(playlist_id, (snapshot_id, current))
+    return current
+
+def invalidate_playlist_cache(playlist_id):
+    """Forget cached metadata and tracks for a playlist that has changed"""
+    playlist_info_cache.invalidate(playlist_id)
+    playlist_tracks_cache.invalidate(playlist_id)
+
+async def get_tracks(track_ids):
+    """Look up tracks in batches of 50 (the Spotify limit), keyed by track ID"""
+    track_ids = list(track_ids)
+    tracks = {}
+    for start in range(0, len(track_ids), 50):
+        results = await sp.tracks(track_ids[start:start + 50])
+        for track in results['tracks']:
+            if track:
+                tracks[track['id']] = {'track': track}
     return tracks
 
-def get_playlist_info(playlist_id):
-    """Get playlist metadata"""
-    return sp.playlist(playlist_id, fields='name,owner.display_name,external_urls,images,tracks.total')
+async def get_playlist_snapshot(playlist_id):
+    """Get only the playlist snapshot ID (changes whenever the playlist is edited)"""
+    return (await sp.playlist(playlist_id, fields='snapshot_id')).get('snapshot_id')
 
-def save_playlist_state(platform, chat_id, playlist_id, track_ids, track_data):
-    """Save current playlist state to MongoDB"""
+# Version of the stored playlist_state layout (2 = compact track data,
+# 3 = track_ids packed into a TrackIdSet blob)
+STATE_FORMAT = 3
+# Bump whenever migrate_chat_playlist_state has to run again on databases it
+# already migrated (a new STATE_FORMAT or a new migration step)
+MIGRATION_VERSION = 1
+
+# Stored track_ids are a packed TrackIdSet plus lists of keys added and
+# removed since it was written. The blob is rewritten once the lists hold
+# more than an eighth of the playlist (and at least COMPACT_MIN_DELTAS keys).
+COMPACT_MIN_DELTAS = 64
+
+def compact_track(track_info):
+    """Keep only the track fields format_song_message needs"""
+    track = track_info['track']
+    images = track['album'].get('images') or []
+    return {
+        'track': {
+            'name': track['name'],
+            'artists': [{'name': artist['name']} for artist in track['artists']],
+            'album': {
+                'name': track['album']['name'],
+                'images': [{'url': images[0]['url']}] if images else []
+            },
+            'external_urls': {'spotify': (track.get('external_urls') or {}).get('spotify', '')},
+            'duration_ms': track.get('duration_ms') or 0
+        }
+    }
+
+def save_playlist_state(platform, playlist_id, track_ids, track_data, snapshot_id=None, tail=None):
+    """Save the full playlist state to MongoDB (one document per playlist).
+    
+    Returns the approximate number of bytes written.
+    """
+    update = {
+        '$set': {
+            'platform': platform,
+            'playlist_id': playlist_id,
+            'track_ids': TrackIdSet.from_ids(track_ids).blob,
+            'track_ids_deltas': 0,
+            'track_data': {track_id: compact_track(track) for track_id, track in track_data.items()},
+            'snapshot_id': snapshot_id,
+            'tail': tail,
+            'state_format': STATE_FORMAT,
+            'last_updated': datetime.utcnow()
+        },
+        '$unset': {'track_ids_added': '', 'track_ids_removed': ''}
+    }
     playlist_collection.update_one(
-        {'platform': platform, 'chat_id': chat_id, 'playlist_id': playlist_id},
+        {'platform': platform, 'playlist_id': playlist_id},
+        update,
+        upsert=True
+    )
+    return len(bson.encode(update))
+
+def playlist_change_writes(platform, playlist_id, added_tracks, removed_ids, snapshot_id=None, tail=None,
+                           track_ids=None, deltas=0):
+    """Build the MongoDB writes that save only what changed since the last saved state.
+    
+    track_ids is the playlist's new TrackIdSet and deltas the number of keys
+    already in the added/removed lists; when those lists get too long the
+    whole set is written instead.
+    Returns the write operations, their approximate size in bytes and the
+    new number of stored deltas.
+    """
+    query = {'platform': platform, 'playlist_id': playlist_id}
+    changes = {
+        '$set': {
+            'snapshot_id': snapshot_id,
+            'tail': tail,
+            'last_updated': datetime.utcnow(),
+            **{f'track_data.{track_id}': compact_track(track) for track_id, track in added_tracks.items()}
+        }
+    }
+    if removed_ids:
+        changes['$unset'] = {f'track_data.{track_id}': '' for track_id in removed_ids}
+    updates = [changes]
+    
+    deltas += len(added_tracks) + len(removed_ids)
+    if track_ids is not None and deltas > max(COMPACT_MIN_DELTAS, len(track_ids) // 8):
+        changes['$set']['track_ids'] = track_ids.blob
+        changes['$set']['track_ids_deltas'] = deltas = 0
+        changes.setdefault('$unset', {}).update({'track_ids_added': '', 'track_ids_removed': ''})
+    elif added_tracks or removed_ids:
+        added_keys = list(TrackIdSet.from_ids(added_tracks).keys())
+        removed_keys = list(TrackIdSet.from_ids(removed_ids).keys())
+        changes['$inc'] = {'track_ids_deltas': len(added_keys) + len(removed_keys)}
+        changes['$addToSet'] = {
+            'track_ids_added': {'$each': added_keys},
+            'track_ids_removed': {'$each': removed_keys}
+        }
+        # A field can't be added to and pulled from in the same update
+        updates.append({'$pull': {
+            'track_ids_added': {'$in': removed_keys},
+            'track_ids_removed': {'$in': added_keys}
+        }})
+    writes = [UpdateOne(query, update, upsert=True) for update in updates]
+    return writes, sum(len(bson.encode(update)) for update in updates), deltas
+
+def save_playlist_writes(writes):
+    """Flush collected playlist state writes in one round-trip.
+    
+    Writes for the same playlist never touch the same track IDs, so they
+    don't need to be applied in order.
+    """
+    if writes:
+        playlist_collection.bulk_write(writes, ordered=False)
+
+# Fields that make up the stored track IDs (see playlist_change_writes)
+TRACK_ID_FIELDS = {'track_ids': 1, 'track_ids_added': 1, 'track_ids_removed': 1, 'track_ids_deltas': 1}
+
+def stored_track_ids(state):
+    """TrackIdSet of a stored playlist state (any format) and its number of stored deltas"""
+    saved = state.get('track_ids') or b''
+    # Before format 3, track_ids was a list of ID strings
+    track_ids = TrackIdSet.from_ids(saved) if isinstance(saved, list) else TrackIdSet(saved)
+    if state.get('track_ids_added'):
+        track_ids = track_ids | TrackIdSet.from_keys(state['track_ids_added'])
+    if state.get('track_ids_removed'):
+        track_ids = track_ids - TrackIdSet.from_keys(state['track_ids_removed'])
+    return track_ids, state.get('track_ids_deltas', 0)
+
+def get_saved_playlist_state(platform, playlist_id):
+    """Get last saved track IDs (with their delta count), snapshot, subscribers and tail (without the track data)"""
+    state = playlist_collection.find_one(
+        {'platform': platform, 'playlist_id': playlist_id},
+        {'_id': 0, **TRACK_ID_FIELDS, 'snapshot_id': 1, 'subscribers': 1, 'tail': 1}
+    ) or {}
+    return (stored_track_ids(state), state.get('snapshot_id'), set(state.get('subscribers', [])),
+            state.get('tail'))
+
+def get_saved_track_data(platform, playlist_id, track_ids):
+    """Get the stored track data for just the given track IDs"""
+    if not track_ids:
+        return {}
+    state = playlist_collection.find_one(
+        {'platform': platform, 'playlist_id': playlist_id},
+        {f'track_data.{track_id}': 1 for track_id in track_ids}
+    )
+    return state.get('track_data', {}) if state else {}
+
+def add_playlist_subscriber(platform, playlist_id, chat_id):
+    """Subscribe a chat to a playlist's change notifications"""
+    playlist_collection.update_one(
+        {'platform': platform, 'playlist_id': playlist_id},
+        {
+            '$addToSet': {'subscribers': chat_id},
+            # Checker workers look up the playlists in their partitions by this field
+            '$set': {'partition': partition_of(playlist_id, CHECK_PARTITIONS)},
+            '$setOnInsert': {'platform': platform, 'playlist_id': playlist_id}
+        },
+        upsert=True
+    )
+    if playlist_id in tracked_playlists:
+        tracked_playlists[playlist_id]['subscribers'].add(chat_id)
+
+def remove_playlist_subscriber(platform, playlist_id, chat_id):
+    """Unsubscribe a chat from a playlist's change notifications"""
+    playlist_collection.update_one(
+        {'platform': platform, 'playlist_id': playlist_id},
+        {'$pull': {'subscribers': chat_id}}
+    )
+    if playlist_id in tracked_playlists:
+        tracked_playlists[playlist_id]['subscribers'].discard(chat_id)
+
+def new_playlist_state(previous_tracks, snapshot_id, subscribers, tail=None):
+    """In-memory state of a tracked playlist.
+    
+    previous_tracks is a TrackIdSet, or None until the saved track IDs are
+    actually needed.
+    tail is the total and last-page fingerprint from playlist_tail(), if known.
+    """
+    return {
+        'previous_tracks': previous_tracks,
+        'snapshot_id': snapshot_id,
+        'subscribers': subscribers,
+        'tail': tail,
+        'tail_checks': 0,
+        'track_deltas': 0,
+        'check_interval': CHECK_INTERVAL,
+        # Random first check so playlists don't all come due at once
+        'next_check': time.monotonic() + random.uniform(0, CHECK_INTERVAL)
+    }
+
+def discard_unsaved_state(playlist_state):
+    """Make the next check reload a playlist's state from MongoDB after its changes couldn't be saved"""
+    playlist_state['previous_tracks'] = None
+    playlist_state['snapshot_id'] = None
+    playlist_state['tail'] = None
+
+def load_tracked_playlist(playlist_id):
+    """Load a playlist's saved state and subscribers into memory"""
+    (saved_tracks, deltas), saved_snapshot, subscribers, tail = get_saved_playlist_state('telegram', playlist_id)
+    tracked_playlists[playlist_id] = new_playlist_state(saved_tracks, saved_snapshot, subscribers, tail)
+    tracked_playlists[playlist_id]['track_deltas'] = deltas
+    return tracked_playlists[playlist_id]
+
+def load_tracked_playlists():
+    """Load every subscribed playlist in one query, leaving track IDs to be loaded lazily"""
+    all_playlists = playlist_collection.find(
+        {'platform': 'telegram', 'subscribers.0': {'$exists': True}},
+        {'_id': 0, 'playlist_id': 1, 'snapshot_id': 1, 'subscribers': 1, 'tail': 1}
+    )
+    for playlist in all_playlists:
+        tracked_playlists[playlist['playlist_id']] = new_playlist_state(
+            None, playlist.get('snapshot_id'), set(playlist['subscribers']), playlist.get('tail')
+        )
+
+def sync_worker_playlists():
+    """Renew this worker's leases and track exactly the playlists in its partitions.
+    
+    Also picks up subscriber changes and /forcecheck requests made through
+    the front end since the last sync.
+    """
+    owned = worker_leases.sync()
+    owned_playlists = playlist_collection.find(
+        {'platform': 'telegram', 'partition': {'$in': sorted(owned)}, 'subscribers.0': {'$exists': True}},
+        {'_id': 0, 'playlist_id': 1, 'snapshot_id': 1, 'subscribers': 1, 'tail': 1, 'check_requested': 1}
+    )
+    owned_ids = set()
+    requested_ids = []
+    for playlist in owned_playlists:
+        playlist_id = playlist['playlist_id']
+        owned_ids.add(playlist_id)
+        playlist_state = tracked_playlists.get(playlist_id)
+        if playlist_state is None:
+            playlist_state = tracked_playlists[playlist_id] = new_playlist_state(
+                None, playlist.get('snapshot_id'), set(playlist['subscribers']), playlist.get('tail')
+            )
+        elif not playlist_state.get('checking'):
+            playlist_state['subscribers'] = set(playlist['subscribers'])
+            if playlist.get('snapshot_id') != playlist_state['snapshot_id']:
+                # Re-baselined by the front end (or taken over from another worker)
+                playlist_state['snapshot_id'] = playlist.get('snapshot_id')
+                playlist_state['previous_tracks'] = None
+                playlist_state['tail'] = playlist.get('tail')
+        if playlist.get('check_requested'):
+            playlist_state['next_check'] = 0
+            requested_ids.append(playlist_id)
+    
+    for playlist_id in list(tracked_playlists):
+        if playlist_id not in owned_ids and not tracked_playlists[playlist_id].get('checking'):
+            del tracked_playlists[playlist_id]
+    if requested_ids:
+        playlist_collection.update_many(
+            {'platform': 'telegram', 'playlist_id': {'$in': requested_ids}},
+            {'$unset': {'check_requested': ''}}
+        )
+
+def request_playlist_check(playlist_id):
+    """Ask whichever worker owns a playlist to check it at its next tick"""
+    playlist_collection.update_one(
+        {'platform': 'telegram', 'playlist_id': playlist_id},
+        {'$set': {'check_requested': True}}
+    )
+
+def get_saved_track_ids(platform, playlist_id):
+    """Get just the last saved track IDs of a playlist, and the number of stored deltas"""
+    state = playlist_collection.find_one(
+        {'platform': platform, 'playlist_id': playlist_id},
+        {'_id': 0, **TRACK_ID_FIELDS}
+    ) or {}
+    return stored_track_ids(state)
+
+def schedule_next_check(playlist_state, changed):
+    """Adapt a playlist's polling interval and schedule its next check.
+    
+    changed is True/False for a successful check and None for a failed one.
+    """
+    interval = playlist_state.get('check_interval', CHECK_INTERVAL)
+    if changed is True:
+        interval = max(MIN_CHECK_INTERVAL, interval / 2)
+    elif changed is False:
+        interval = min(MAX_CHECK_INTERVAL, interval * CHECK_BACKOFF)
+    playlist_state['check_interval'] = interval
+    # Jitter keeps playlists with the same interval from bunching up
+    playlist_state['next_check'] = time.monotonic() + interval * random.uniform(0.9, 1.1)
+
+def ensure_indexes():
+    """Create the indexes behind the bot's MongoDB queries (no-op if they exist)
+
+    Run after migrate_chat_playlist_state: the playlist index is unique, which
+    legacy per-chat states (several documents per playlist) would violate.
+    """
+    config_collection.create_index([('platform', 1), ('chat_id', 1), ('setting', 1)])
+    config_collection.create_index([('platform', 1), ('setting', 1)])
+    # One state document per playlist, so concurrent upserts can't create duplicates
+    playlist_collection.create_index([('platform', 1), ('playlist_id', 1)], unique=True)
+    playlist_collection.create_index([('platform', 1), ('partition', 1)])
+    notification_collection.create_index([('created_at', 1)])
+    # Uploaded album art file_ids are re-uploaded from the URL after a while
+    db['album_art_files'].create_index([('created_at', 1)], expireAfterSeconds=ALBUM_ART_CACHE_TTL)
+
+def migrate_chat_playlist_state():
+    """Migrate per-chat playlist state documents to one document per playlist.
+    
+    Runs once per MIGRATION_VERSION; later starts just read the recorded
+    version from bot_config.
+    """
+    version_query = {'platform': 'telegram', 'setting': 'migration_version'}
+    migrated = config_collection.find_one(version_query, {'_id': 0, 'migration_version': 1})
+    if migrated and migrated.get('migration_version') == MIGRATION_VERSION:
+        return
+    
+    legacy_states = list(playlist_collection.find({'chat_id': {'$exists': True}}))
+    if legacy_states:
+        # Newest state wins when several chats tracked the same playlist
+        legacy_states.sort(key=lambda state: state.get('last_updated') or datetime.min)
+        for state in legacy_states:
+            playlist_collection.update_one(
+                {'platform': state['platform'], 'playlist_id': state['playlist_id'], 'chat_id': {'$exists': False}},
+                {
+                    '$set': {
+                        'platform': state['platform'],
+                        'playlist_id': state['playlist_id'],
+                        'track_ids': state.get('track_ids', []),
+                        'track_data': state.get('track_data', {}),
+                        'snapshot_id': state.get('snapshot_id'),
+                        'last_updated': state.get('last_updated') or datetime.utcnow()
+                    }
+                },
+                upsert=True
+            )
+        playlist_collection.delete_many({'_id': {'$in': [state['_id'] for state in legacy_states]}})
+        print(f"✅ Migrated {len(legacy_states)} per-chat playlist states")
+    
+    # Shrink states saved before track data and IDs were stored compactly
+    old_states = playlist_collection.find({'state_format': {'$ne': STATE_FORMAT}}, {'track_data': 1, **TRACK_ID_FIELDS})
+    compacted = 0
+    for state in old_states:
+        track_data = {}
+        for track_id, track in (state.get('track_data') or {}).items():
+            try:
+                track_data[track_id] = compact_track(track)
+            except (KeyError, TypeError, IndexError):
+                pass  # Unusable entry; removals fall back to a Spotify lookup
+        track_ids, _ = stored_track_ids(state)
+        playlist_collection.update_one(
+            {'_id': state['_id']},
+            {
+                '$set': {'track_data': track_data, 'track_ids': track_ids.blob, 'track_ids_deltas': 0,
+                         'state_format': STATE_FORMAT},
+                '$unset': {'track_ids_added': '', 'track_ids_removed': ''}
+            }
+        )
+        compacted += 1
+    if compacted:
+        print(f"✅ Compacted {compacted} stored playlist states")
+    
+    # Rebuild the playlist -> subscribers index from the per-chat settings
+    all_configs = config_collection.find(
+        {'platform': 'telegram', 'setting': 'playlist_id'},
+        {'_id': 0, 'chat_id': 1, 'playlist_id': 1}
+    )
+    subscriber_writes = [
+        UpdateOne(
+            {'platform': 'telegram', 'playlist_id': config['playlist_id']},
+            {
+                '$addToSet': {'subscribers': config['chat_id']},
+                '$set': {'partition': partition_of(config['playlist_id'], CHECK_PARTITIONS)},
+                '$setOnInsert': {'platform': 'telegram', 'playlist_id': config['playlist_id']}
+            },
+            upsert=True
+        )
+        for config in all_configs
+    ]
+    if subscriber_writes:
+        playlist_collection.bulk_write(subscriber_writes, ordered=False)
+    config_collection.update_one(
+        version_query,
+        {'$set': {**version_query, 'migration_version': MIGRATION_VERSION, 'updated_at': datetime.utcnow()}},
+        upsert=True
+    )
+
+def assign_playlist_partitions():
+    """Store every playlist's partition, unless it was already done for this CHECK_PARTITIONS"""
+    query = {'platform': 'telegram', 'setting': 'check_partitions'}
+    config = config_collection.find_one(query, {'_id': 0, 'check_partitions': 1})
+    if config and config.get('check_partitions') == CHECK_PARTITIONS:
+        return
+    playlists = playlist_collection.find({'platform': 'telegram'}, {'_id': 0, 'playlist_id': 1})
+    partition_writes = [
+        UpdateOne(
+            {'platform': 'telegram', 'playlist_id': playlist['playlist_id']},
+            {'$set': {'partition': partition_of(playlist['playlist_id'], CHECK_PARTITIONS)}}
+        )
+        for playlist in playlists
+    ]
+    if partition_writes:
+        playlist_collection.bulk_write(partition_writes, ordered=False)
+    config_collection.update_one(
+        query,
+        {'$set': {**query, 'check_partitions': CHECK_PARTITIONS, 'updated_at': datetime.utcnow()}},
+        upsert=True
+    )
+    print(f"✅ Assigned {len(partition_writes)} playlists to {CHECK_PARTITIONS} partitions")
+
+def get_chat_notify_modes(chat_ids):
+    """Get the notification mode chosen by each of the given chats"""
+    configs = config_collection.find(
+        {'platform': 'telegram', 'chat_id': {'$in': list(chat_ids)}, 'setting': 'notify_mode'},
+        {'_id': 0, 'chat_id': 1, 'notify_mode': 1}
+    )
+    return {config['chat_id']: config['notify_mode'] for config in configs}
+
+def save_chat_notify_mode(chat_id, mode):
+    """Save the notification mode for a specific chat"""
+    config_collection.update_one(
+        {'platform': 'telegram', 'chat_id': chat_id, 'setting': 'notify_mode'},
         {
             '$set': {
-                'platform': platform,
+                'platform': 'telegram',
                 'chat_id': chat_id,
-                'playlist_id': playlist_id,
-                'track_ids': list(track_ids),
-                'track_data': track_data,
-                'last_updated': datetime.utcnow()
+                'setting': 'notify_mode',
+                'notify_mode': mode,
+                'updated_at': datetime.utcnow()
             }
         },
         upsert=True
     )
 
-def get_saved_playlist_state(platform, chat_id, playlist_id):
-    """Get last saved playlist state from MongoDB"""
-    state = playlist_collection.find_one({
-        'platform': platform,
-        'chat_id': chat_id,
-        'playlist_id': playlist_id
-    })
-    if state:
-        return set(state['track_ids']), state.get('track_data', {})
-    return set(), {}
-
 def format_song_message(track_info, action):
     """Format song info as Telegram message"""
     track = track_info['track']
@@ -225,6 +913,14 @@ def format_song_message(track_info, action):
     return message, album_art
 
 # Command handlers
+def interactive(handler):
+    """Give a command handler's Spotify calls priority over the background checker"""
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        with spotify_governor.priority(INTERACTIVE):
+            return await handler(update, context)
+    return wrapper
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send a message when the command /start is issued."""
     keyboard = [
@@ -250,6 +946,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /setplaylist <url> - Set Spotify playlist to track
 • Accepts full URL or playlist ID
 • Example: `/setplaylist https://open.spotify.com/playlist/...`
+/notifymode <mode> - Choose per-song, digest or auto notifications
 
 *Information Commands:*
 /status - Check current tracking status
@@ -260,11 +957,12 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /stop - Stop tracking in this chat
 
 *Features:*
-✨ Automatic tracking every 2 minutes
+✨ Automatic tracking (busy playlists are checked more often)
 ➕ Notifications when songs are added
 ➖ Notifications when songs are removed
 💾 Remembers changes even when bot restarts
 🎨 Beautiful messages with album art
+📋 Big edits summarized in a digest
 
 *Quick Start:*
 1️⃣ Use /setplaylist with your Spotify playlist URL
@@ -274,6 +972,7 @@ _Made with ❤️ for music lovers_
 """
     await update.message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
 
+@interactive
 async def set_playlist(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Set the playlist to track"""
     chat_id = update.effective_chat.id
@@ -300,19 +999,30 @@ async def set_playlist(update: Update, context: ContextTypes.DEFAULT_TYPE):
     processing_msg = await update.message.reply_text("🔄 Setting up playlist tracking...")
     
     try:
-        playlist_info = get_playlist_info(playlist_id)
-        save_chat_playlist_id(chat_id, playlist_id)
+        playlist_info = await get_playlist_info(playlist_id)
         
-        current_tracks_list = get_playlist_tracks(playlist_id)
-        current_tracks = {track['track']['id']: track for track in current_tracks_list if track['track']}
-        current_track_ids = set(current_tracks.keys())
+        old_playlist_id = get_chat_playlist_id(chat_id)
+        if old_playlist_id and old_playlist_id != playlist_id:
+            remove_playlist_subscriber('telegram', old_playlist_id, chat_id)
+        save_chat_playlist_id(chat_id, playlist_id)
         
-        if chat_id not in tracked_chats:
-            tracked_chats[chat_id] = {}
-        tracked_chats[chat_id]['playlist_id'] = playlist_id
-        tracked_chats[chat_id]['previous_tracks'] = current_track_ids
+        playlist_state = tracked_playlists.get(playlist_id) or load_tracked_playlist(playlist_id)
+        if not playlist_state['subscribers']:
+            # First subscriber: take a fresh baseline. Otherwise the shared state is
+            # kept so pending changes still reach the chats already subscribed.
+            current_tracks, tail = await get_cached_current_tracks(playlist_id, playlist_info.get('snapshot_id'))
+            current_track_ids = TrackIdSet.from_ids(current_tracks)
+            
+            playlist_state['previous_tracks'] = current_track_ids
+            playlist_state['snapshot_id'] = playlist_info.get('snapshot_id')
+            playlist_state['tail'] = tail
+            playlist_state['tail_checks'] = 0
+            playlist_state['track_deltas'] = 0
+            await asyncio.to_thread(save_playlist_state, 'telegram', playlist_id, current_track_ids, current_tracks,
+                                    playlist_info.get('snapshot_id'), tail)
         
-        save_playlist_state('telegram', chat_id, playlist_id, current_track_ids, current_tracks)
+        add_playlist_subscriber('telegram', playlist_id, chat_id)
+        tracked_chats[chat_id] = {'playlist_id': playlist_id}
         
         message = (
             f"✅ *Playlist Set Successfully!*\n\n"
@@ -321,7 +1031,7 @@ async def set_playlist(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"📊 Total Tracks: {playlist_info['tracks']['total']}\n"
             f"✅ Tracking: Active\n\n"
             f"I'll notify you here when songs are added or removed!\n"
-            f"Checking every 2 minutes."
+            f"Busy playlists are checked more often."
         )
         
         await processing_msg.edit_text(message, parse_mode=ParseMode.MARKDOWN, disable_web_page_preview=False)
@@ -338,6 +1048,7 @@ async def set_playlist(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         await processing_msg.edit_text(f"❌ Error: {str(e)}")
 
+@interactive
 async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Check bot status"""
     chat_id = update.effective_chat.id
@@ -352,15 +1063,20 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     try:
-        playlist_info = get_playlist_info(playlist_id)
-        track_count = len(tracked_chats.get(chat_id, {}).get('previous_tracks', set()))
+        playlist_info = await get_playlist_info(playlist_id)
+        playlist_state = tracked_playlists.get(playlist_id, {})
+        if playlist_state.get('previous_tracks') is not None:
+            track_count = len(playlist_state['previous_tracks'])
+        else:
+            track_count = playlist_info['tracks']['total']
+        check_interval = playlist_state.get('check_interval', CHECK_INTERVAL)
         
         message = (
             f"🎵 *Playlist Tracker Status*\n\n"
             f"*Current Playlist:*\n"
             f"[{playlist_info['name']}]({playlist_info['external_urls']['spotify']})\n\n"
             f"📊 Total Songs: {track_count}\n"
-            f"⏱ Check Interval: Every 2 minutes\n"
+            f"⏱ Check Interval: Every {check_interval / 60:.1f} minutes\n"
             f"✅ Status: Active"
         )
         
@@ -369,18 +1085,78 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         await update.message.reply_text(f"❌ Error: {str(e)}")
 
+def describe_last_check(playlist_id):
+    """Describe the result of a playlist's most recent check for /forcecheck"""
+    last_check = tracked_playlists.get(playlist_id, {}).get('last_check')
+    if BOT_MODE == 'frontend' or not last_check:
+        # Workers do the checking; the front end only knows a check was asked for
+        return "✅ Check requested! Any changes will be posted shortly."
+    ago = time.monotonic() - last_check['at']
+    if last_check['changes'] is None:
+        return f"❌ The last check ({ago:.0f}s ago) failed. Please try again later."
+    if not last_check['changes']:
+        return f"✅ Checked {ago:.0f}s ago: no changes."
+    return f"✅ Checked {ago:.0f}s ago: {last_check['changes']} changes, posted shortly."
+
+@interactive
 async def force_check(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Manually trigger playlist check"""
     chat_id = update.effective_chat.id
+    playlist_id = tracked_chats.get(chat_id, {}).get('playlist_id') or get_chat_playlist_id(chat_id)
+    
+    if not playlist_id:
+        await update.message.reply_text(
+            "⚠️ *No playlist set!*\n\n"
+            "Use /setplaylist to start tracking a playlist.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    # Repeated /forcecheck gets the latest result instead of another check
+    now = time.monotonic()
+    last_forced = last_force_checks.get(chat_id)
+    if last_forced is not None and now - last_forced < FORCE_CHECK_COOLDOWN:
+        await update.message.reply_text(describe_last_check(playlist_id))
+        return
+    last_force_checks[chat_id] = now
     
     msg = await update.message.reply_text("🔄 Checking playlist for changes...")
     
     try:
+        # Joins the playlist's check if one is already running
         await check_playlist_for_chat(context.application, chat_id)
-        await msg.edit_text("✅ Check complete! Any changes have been posted.")
+        await msg.edit_text(describe_last_check(playlist_id))
     except Exception as e:
         await msg.edit_text(f"❌ Error: {str(e)}")
 
+async def notify_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Choose between per-song notifications and digests"""
+    chat_id = update.effective_chat.id
+    
+    if not context.args:
+        mode = get_chat_notify_modes([chat_id]).get(chat_id, DEFAULT_NOTIFY_MODE)
+        await update.message.reply_text(
+            f"🔔 Notification mode: *{mode}*\n\n"
+            "Usage: `/notifymode <per-song|digest|auto>`\n"
+            "• *per-song* - A message for every song\n"
+            "• *digest* - One summary per check\n"
+            f"• *auto* - A summary when more than {DIGEST_THRESHOLD} songs change",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    mode = context.args[0].lower()
+    if mode not in NOTIFY_MODES:
+        await update.message.reply_text(
+            "❌ Unknown mode!\n\n"
+            "Usage: `/notifymode <per-song|digest|auto>`",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    save_chat_notify_mode(chat_id, mode)
+    await update.message.reply_text(f"✅ Notification mode set to *{mode}*", parse_mode=ParseMode.MARKDOWN)
+
 async def stop_tracking(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Stop tracking in this chat"""
     chat_id = update.effective_chat.id
@@ -388,6 +1164,10 @@ async def stop_tracking(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if chat_id in tracked_chats:
         del tracked_chats[chat_id]
     
+    playlist_id = get_chat_playlist_id(chat_id)
+    if playlist_id:
+        remove_playlist_subscriber('telegram', playlist_id, chat_id)
+    
     config_collection.delete_one({
         'platform': 'telegram',
         'chat_id': chat_id,
@@ -402,105 +1182,455 @@ async def stop_tracking(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 # Background task
-async def check_playlist_for_chat(application, chat_id):
-    """Check playlist for a specific chat"""
-    if chat_id not in tracked_chats:
-        playlist_id = get_chat_playlist_id(chat_id)
-        if not playlist_id:
-            return
-        
-        saved_tracks, saved_data = get_saved_playlist_state('telegram', chat_id, playlist_id)
-        tracked_chats[chat_id] = {
-            'playlist_id': playlist_id,
-            'previous_tracks': saved_tracks
-        }
+def song_notification(track_info, action):
+    """Build an added/removed song notification for the delivery queue"""
+    try:
+        message, album_art = format_song_message(track_info, action)
+        return {'text': message, 'photo': album_art, 'parse_mode': ParseMode.MARKDOWN.value}
+    except (KeyError, TypeError, IndexError):
+        if action == 'added':
+            return {'text': "🆕 A song was added to the playlist", 'photo': None}
+        return {'text': "🗑️ A song was removed from the playlist", 'photo': None}
+
+def format_digest_line(track_info, action):
+    """One line of a digest page for an added/removed song"""
+    emoji = "➕" if action == "added" else "➖"
+    try:
+        track = track_info['track']
+        artists = ', '.join(artist['name'] for artist in track['artists'])
+        # Escaped names stay outside the link, where Markdown allows escaping
+        return (f"{emoji} {escape_markdown(track['name'])} — {escape_markdown(artists)} "
+                f"[▶️]({track['external_urls']['spotify']})")
+    except (KeyError, TypeError, IndexError):
+        return f"{emoji} A song was {action}"
+
+def digest_notifications(changes):
+    """Summarize (track_info, action) changes in as few notifications as possible.
     
-    playlist_id = tracked_chats[chat_id]['playlist_id']
-    previous_tracks = tracked_chats[chat_id]['previous_tracks']
+    Up to MEDIA_GROUP_SIZE songs that all have album art become one album;
+    anything else becomes pages of DIGEST_PAGE_SIZE songs. The album keeps
+    the text as well, for when Telegram refuses the photos.
+    """
+    added = sum(1 for _, action in changes if action == 'added')
+    summary = f"📋 *Playlist updated:* {added} added, {len(changes) - added} removed"
+    
+    chunks = [[]]
+    chunk_chars = 0
+    for track_info, action in changes:
+        line = format_digest_line(track_info, action)
+        if len(chunks[-1]) >= DIGEST_PAGE_SIZE or chunk_chars + len(line) > DIGEST_PAGE_CHARS:
+            chunks.append([])
+            chunk_chars = 0
+        chunks[-1].append(line)
+        chunk_chars += len(line) + 1
+    pages = []
+    for number, lines in enumerate(chunks, 1):
+        header = f"{summary} ({number}/{len(chunks)})" if len(chunks) > 1 else summary
+        pages.append({'text': '\n\n'.join([header, '\n'.join(lines)]), 'photo': None,
+                      'parse_mode': ParseMode.MARKDOWN.value})
+    
+    if 1 < len(changes) <= MEDIA_GROUP_SIZE:
+        media = [song_notification(track_info, action) for track_info, action in changes]
+        if all(item['photo'] for item in media):
+            pages[0]['media'] = [{'photo': item['photo'], 'caption': item['text']} for item in media]
+    return pages
+
+def wants_digest(mode, change_count):
+    if mode == 'digest':
+        return change_count > 1
+    if mode == 'auto':
+        return change_count > DIGEST_THRESHOLD
+    return False
+
+async def notify_subscribers(chat_ids, changes):
+    """Queue notifications for a check's (track_info, action) changes in each chat's mode"""
+    modes = await asyncio.to_thread(get_chat_notify_modes, chat_ids)
+    built = {}
+    for chat_id in chat_ids:
+        digest = wants_digest(modes.get(chat_id, DEFAULT_NOTIFY_MODE), len(changes))
+        if digest not in built:
+            if digest:
+                built[digest] = digest_notifications(changes)
+            else:
+                built[digest] = [song_notification(track_info, action) for track_info, action in changes]
+        # Only queue here; the delivery queue deals with Telegram's rate limits
+        for notification in built[digest]:
+            notification_queue.put({'chat_id': chat_id, **notification})
+
+def diff_track_ids(previous_tracks, current_tracks, complete):
+    """Compare saved track IDs with fetched ones.
+    
+    current_tracks holds the whole playlist if complete, otherwise only
+    tracks appended at the end. Returns the new TrackIdSet and the added
+    and removed track IDs (as sets of strings).
+    """
+    fetched = TrackIdSet.from_ids(current_tracks)
+    added_ids = set(fetched - previous_tracks)
+    if not complete:
+        return previous_tracks | fetched, added_ids, set()
+    return fetched, added_ids, set(previous_tracks - fetched)
+
+async def check_playlist(application, playlist_id, state_writes=None):
+    """Check a playlist once and notify every subscribed chat.
     
+    Spotify requests are awaited on the event loop and blocking MongoDB calls
+    run in worker threads, so several playlists can be checked concurrently.
+    If a state_writes list is given, the state update is added to it instead
+    of being written right away. Returns False if the check failed.
+    """
+    playlist_state = tracked_playlists.get(playlist_id) or await asyncio.to_thread(load_tracked_playlist, playlist_id)
+    
+    playlist_state['last_write_bytes'] = 0
+    started = time.monotonic()
     try:
-        current_tracks_list = get_playlist_tracks(playlist_id)
-        current_tracks = {track['track']['id']: track for track in current_tracks_list if track['track']}
-        current_track_ids = set(current_tracks.keys())
+        # Cheap check first: an unchanged snapshot means nothing to fetch, diff or save
+        snapshot_id = await get_playlist_snapshot(playlist_id)
+        if snapshot_id and snapshot_id == playlist_state.get('snapshot_id'):
+            playlist_state['last_check'] = {'at': time.monotonic(), 'changes': 0}
+            schedule_next_check(playlist_state, False)
+            return True
+        invalidate_playlist_cache(playlist_id)
         
-        added_ids = current_track_ids - previous_tracks
-        removed_ids = previous_tracks - current_track_ids
+        if playlist_state['previous_tracks'] is None:
+            playlist_state['previous_tracks'], playlist_state['track_deltas'] = await asyncio.to_thread(
+                get_saved_track_ids, 'telegram', playlist_id
+            )
+        previous_tracks = playlist_state['previous_tracks']
         
-        for track_id in added_ids:
-            message, album_art = format_song_message(current_tracks[track_id], 'added')
-            if album_art:
-                await application.bot.send_photo(
-                    chat_id=chat_id,
-                    photo=album_art,
-                    caption=message,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-            else:
-                await application.bot.send_message(
-                    chat_id=chat_id,
-                    text=message,
-                    parse_mode=ParseMode.MARKDOWN
-                )
+        # Fast path: if the playlist only grew at the end, fetch just the new tail
+        appended = None
+        if playlist_state.get('tail') and playlist_state['tail_checks'] < FULL_FETCH_EVERY:
+            appended = await get_appended_tracks(playlist_id, playlist_state['tail'])
+        if appended is not None:
+            appended_items, tail = appended
+            current_tracks = {item_track_id(item): item for item in appended_items}
+            playlist_state['tail_checks'] += 1
+        else:
+            current_tracks, tail = await fetch_current_tracks(playlist_id)
+            playlist_state['tail_checks'] = 0
+        current_track_ids, added_ids, removed_ids = await asyncio.to_thread(
+            diff_track_ids, previous_tracks, current_tracks, appended is None
+        )
         
-        for track_id in removed_ids:
+        # Removed tracks come from the saved state; only tracks missing there
+        # are looked up on Spotify, in batches
+        removed_tracks = await asyncio.to_thread(get_saved_track_data, 'telegram', playlist_id, removed_ids)
+        missing_ids = removed_ids - removed_tracks.keys()
+        if missing_ids:
             try:
-                track_data = sp.track(track_id)
-                track_info = {'track': track_data}
-                message, album_art = format_song_message(track_info, 'removed')
-                if album_art:
-                    await application.bot.send_photo(
-                        chat_id=chat_id,
-                        photo=album_art,
-                        caption=message,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                else:
-                    await application.bot.send_message(
-                        chat_id=chat_id,
-                        text=message,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-            except:
-                await application.bot.send_message(
-                    chat_id=chat_id,
-                    text="🗑️ A song was removed from the playlist"
-                )
+                removed_tracks.update(await get_tracks(missing_ids))
+            except Exception as e:
+                print(f"Error looking up removed tracks for playlist {playlist_id}: {e}")
+        
+        # Unresolved removed tracks (None) get the generic removal message
+        changes = [(current_tracks[track_id], 'added') for track_id in added_ids]
+        changes += [(removed_tracks.get(track_id), 'removed') for track_id in removed_ids]
+        if changes and playlist_state['subscribers']:
+            await notify_subscribers(list(playlist_state['subscribers']), changes)
         
-        tracked_chats[chat_id]['previous_tracks'] = current_track_ids
-        save_playlist_state('telegram', chat_id, playlist_id, current_track_ids, current_tracks)
+        playlist_state['previous_tracks'] = current_track_ids
+        playlist_state['snapshot_id'] = snapshot_id
+        playlist_state['tail'] = tail
+        added_tracks = {track_id: current_tracks[track_id] for track_id in added_ids}
+        writes, playlist_state['last_write_bytes'], playlist_state['track_deltas'] = playlist_change_writes(
+            'telegram', playlist_id, added_tracks, removed_ids, snapshot_id, tail,
+            current_track_ids, playlist_state['track_deltas']
+        )
+        if state_writes is None:
+            try:
+                await asyncio.to_thread(save_playlist_writes, writes)
+            except Exception:
+                discard_unsaved_state(playlist_state)
+                raise
+        else:
+            state_writes.extend(writes)
+        playlist_state['last_check'] = {'at': time.monotonic(), 'changes': len(changes)}
+        schedule_next_check(playlist_state, bool(added_ids or removed_ids))
+        return True
         
     except Exception as e:
-        print(f"Error checking playlist for chat {chat_id}: {e}")
+        print(f"Error checking playlist {playlist_id}: {e}")
+        PLAYLIST_CHECK_ERRORS.inc()
+        playlist_state['last_check'] = {'at': time.monotonic(), 'changes': None}
+        schedule_next_check(playlist_state, None)
+        return False
+    finally:
+        PLAYLIST_CHECK_SECONDS.observe(time.monotonic() - started)
 
-async def check_all_playlists(context: ContextTypes.DEFAULT_TYPE):
-    """Check all tracked playlists"""
-    all_configs = config_collection.find({
-        'platform': 'telegram',
-        'setting': 'playlist_id'
-    })
+async def run_playlist_check(application, playlist_id, state_writes=None, forced=False):
+    """Check a playlist, or wait for the check of it already in flight and share its result.
     
-    for config in all_configs:
-        chat_id = config['chat_id']
-        await check_playlist_for_chat(context.application, chat_id)
+    Background checks queue for a check_semaphore slot. A forced check
+    starts right away, taking over a queued background check of the same
+    playlist; the queued one then just waits for the forced one's result.
+    A check whose writes were added to state_writes stays in flight until
+    release_flights() is called after they are saved; a forced check waits
+    for that and then checks again rather than reusing the finished result.
+    """
+    flight = checks_in_flight.get(playlist_id)
+    while forced and flight and flight['saved']:
+        await flight['saved'].wait()
+        flight = checks_in_flight.get(playlist_id)
+    if flight and (flight['started'] or not forced):
+        return await asyncio.shield(flight['result'])
+    if flight is None:
+        flight = checks_in_flight[playlist_id] = {
+            'result': asyncio.get_running_loop().create_future(), 'started': False, 'state_writes': None,
+            'saved': None
+        }
+    if forced:
+        return await _run_flight(application, playlist_id, flight, None)
+    async with check_semaphore:
+        if not flight['started']:
+            return await _run_flight(application, playlist_id, flight, state_writes)
+    return await asyncio.shield(flight['result'])
 
-async def check_all_playlists(application):
-    """Check all tracked playlists (runs every 2 minutes)"""
-    all_configs = config_collection.find({
-        'platform': 'telegram',
-        'setting': 'playlist_id'
-    })
+async def _run_flight(application, playlist_id, flight, state_writes):
+    flight['started'] = True
+    try:
+        result = await check_playlist(application, playlist_id, state_writes)
+    except BaseException:
+        flight['result'].cancel()
+        if checks_in_flight.get(playlist_id) is flight:
+            del checks_in_flight[playlist_id]
+        raise
+    flight['result'].set_result(result)
+    if state_writes is None:
+        if checks_in_flight.get(playlist_id) is flight:
+            del checks_in_flight[playlist_id]
+    else:
+        flight['state_writes'] = state_writes
+        flight['saved'] = asyncio.Event()
+    return result
+
+def release_flights(state_writes):
+    """End the checks whose buffered state_writes have now been saved"""
+    for playlist_id, flight in list(checks_in_flight.items()):
+        if flight['state_writes'] is state_writes:
+            del checks_in_flight[playlist_id]
+            flight['saved'].set()
+
+async def check_playlist_for_chat(application, chat_id):
+    """Check the playlist tracked by a specific chat"""
+    if chat_id not in tracked_chats:
+        playlist_id = get_chat_playlist_id(chat_id)
+        if not playlist_id:
+            return
+        tracked_chats[chat_id] = {'playlist_id': playlist_id}
+    
+    playlist_id = tracked_chats[chat_id]['playlist_id']
+    if BOT_MODE == 'frontend':
+        # Checking here would race the worker that owns the playlist
+        return await asyncio.to_thread(request_playlist_check, playlist_id)
+    return await run_playlist_check(application, playlist_id, forced=True)
+
+def get_subscribed_playlist_ids():
+    """Get every playlist that has at least one subscribed chat"""
+    all_playlists = playlist_collection.find(
+        {'platform': 'telegram', 'subscribers.0': {'$exists': True}},
+        {'_id': 0, 'playlist_id': 1}
+    )
+    return [playlist['playlist_id'] for playlist in all_playlists]
+
+async def check_all_playlists(application, playlist_ids=None):
+    """Check the given (default: all tracked) playlists once each, CHECK_CONCURRENCY at a time"""
+    started = time.monotonic()
+    if playlist_ids is None:
+        playlist_ids = await asyncio.to_thread(get_subscribed_playlist_ids)
+    state_writes = []
+    
+    async def check_with_limit(playlist_id):
+        try:
+            return await run_playlist_check(application, playlist_id, state_writes)
+        finally:
+            if playlist_id in tracked_playlists:
+                tracked_playlists[playlist_id]['checking'] = False
+    
+    try:
+        results = await asyncio.gather(
+            *(check_with_limit(playlist_id) for playlist_id in playlist_ids),
+            return_exceptions=True
+        )
+        failed = sum(1 for result in results if result is not True)
+        try:
+            await asyncio.to_thread(save_playlist_writes, state_writes)
+        except Exception as e:
+            print(f"❌ Error saving playlist states: {e}")
+            # The checks already moved the in-memory state past what is stored
+            for playlist_id in playlist_ids:
+                playlist_state = tracked_playlists.get(playlist_id)
+                if playlist_state and playlist_state.get('last_write_bytes'):
+                    discard_unsaved_state(playlist_state)
+    finally:
+        release_flights(state_writes)
+    bytes_written = sum(tracked_playlists.get(playlist_id, {}).get('last_write_bytes', 0) for playlist_id in playlist_ids)
+    
+    elapsed = time.monotonic() - started
+    CHECK_CYCLE_SECONDS.observe(elapsed)
+    print(f"✅ Checked {len(playlist_ids)} playlists in {elapsed:.1f}s "
+          f"({failed} failed, concurrency {CHECK_CONCURRENCY}, {bytes_written / 1024:.1f} KB state written)")
+
+async def run_due_playlist_checks(context: ContextTypes.DEFAULT_TYPE):
+    """Start checks for the playlists whose next check is due (runs every SCHEDULER_TICK seconds)"""
+    now = time.monotonic()
+    due_ids = [
+        playlist_id for playlist_id, playlist_state in tracked_playlists.items()
+        if playlist_state['subscribers']
+        and not playlist_state.get('checking')
+        and playlist_state.get('next_check', 0) <= now
+    ]
+    if not due_ids:
+        return
+    
+    for playlist_id in due_ids:
+        tracked_playlists[playlist_id]['checking'] = True
+    # Don't hold up the tick: slow playlists must not delay the next due ones
+    context.application.create_task(check_all_playlists(context.application, due_ids))
+
+async def refresh_spotify_token(context: ContextTypes.DEFAULT_TYPE):
+    """Refresh the Spotify token ahead of expiry (runs every TOKEN_REFRESH_CHECK seconds)"""
+    token_info = cache_handler.get_cached_token()
+    if not token_info or seconds_left(token_info) > TOKEN_REFRESH_MARGIN:
+        return
+    try:
+        await asyncio.to_thread(spotify_auth.refresh_if_expiring, TOKEN_REFRESH_MARGIN)
+    except Exception as e:
+        print(f"❌ Error refreshing Spotify token: {e}")
+
+async def sync_worker(context: ContextTypes.DEFAULT_TYPE):
+    """Renew leases and refresh the owned playlists (runs every LEASE_RENEW seconds)"""
+    try:
+        await asyncio.to_thread(sync_worker_playlists)
+    except Exception as e:
+        print(f"❌ Error syncing worker leases: {e}")
+
+async def poll_outbox(context: ContextTypes.DEFAULT_TYPE):
+    """Pick up notifications written by checker workers (runs every OUTBOX_POLL seconds)"""
+    try:
+        await notification_queue.poll_outbox()
+    except Exception as e:
+        print(f"❌ Error reading the notification outbox: {e}")
+
+def webhook_secret():
+    """Secret Telegram sends with every webhook update (stable across restarts)"""
+    return os.getenv('WEBHOOK_SECRET') or hashlib.sha256(os.getenv('TELEGRAM_BOT_TOKEN', '').encode()).hexdigest()
+
+async def start_receiving_updates(application, server):
+    """Have Telegram push updates to the webhook, or poll for them as a fallback"""
+    if WEBHOOK_URL:
+        try:
+            await application.bot.set_webhook(
+                WEBHOOK_URL + WEBHOOK_PATH,
+                secret_token=server.webhook_secret,
+                allowed_updates=Update.ALL_TYPES
+            )
+            print(f"📨 Receiving updates by webhook at {WEBHOOK_URL}{WEBHOOK_PATH}")
+            return
+        except TelegramError as e:
+            print(f"⚠️ Couldn't set the webhook ({e}), falling back to polling")
+            server.webhook_path = None
+    # start_polling removes any webhook left from an earlier run
+    await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+    print("📨 Receiving updates by polling")
+
+async def run_bot(application, prepare, started):
+    """Serve health checks and run the bot until SIGINT/SIGTERM.
+    
+    The health server (if any) comes up first; prepare (blocking startup work such as
+    loading state) runs in a thread after it.
+    """
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+    
+    async def receive_update(data):
+        await application.update_queue.put(Update.de_json(data, application.bot))
+    
+    receives_updates = BOT_MODE != 'worker'
+    port = PORT if receives_updates else WORKER_PORT
+    server = HealthServer(port, metrics=render_metrics) if port else None
+    if receives_updates and WEBHOOK_URL:
+        server.webhook_path = WEBHOOK_PATH
+        server.webhook_secret = webhook_secret()
+        server.on_update = receive_update
+    if server:
+        await server.start()
+    
+    try:
+        await asyncio.to_thread(prepare)
+        async with application:
+            await post_init(application)
+            await application.start()
+            if receives_updates:
+                await start_receiving_updates(application, server)
+            print(f"⚡ Startup took {time.monotonic() - started:.2f}s")
+            try:
+                await stopping.wait()
+            finally:
+                if application.updater.running:
+                    await application.updater.stop()
+                await application.stop()
+                await post_shutdown(application)
+                if worker_leases:
+                    await asyncio.to_thread(worker_leases.release)
+    finally:
+        if server:
+            await server.stop()
+
+async def post_init(application):
+    """Start delivering queued notifications once the bot is running"""
+    await notification_queue.start(application)
+
+async def post_shutdown(application):
+    """Keep undelivered notifications for the next start"""
+    await notification_queue.stop()
+    await spotify_client.aclose()
+
+def load_bot_state():
+    """Migrate and load the saved chats and playlists (blocking)"""
+    print("📂 Loading tracked chats from database...")
+    migrate_chat_playlist_state()
+    ensure_indexes()
+    all_configs = config_collection.find(
+        {'platform': 'telegram', 'setting': 'playlist_id'},
+        {'_id': 0, 'chat_id': 1, 'playlist_id': 1}
+    )
     
     for config in all_configs:
-        chat_id = config['chat_id']
-        await check_playlist_for_chat(application, chat_id)
+        tracked_chats[config['chat_id']] = {'playlist_id': config['playlist_id']}
+    
+    # Track IDs are loaded the first time each playlist is found to have changed
+    load_tracked_playlists()
+    
+    print(f"✅ Loaded {len(tracked_chats)} tracked chats ({len(tracked_playlists)} playlists) from database")
+
+def prepare_worker():
+    """Playlists come from the partitions this worker leases, see sync_worker"""
+    migrate_chat_playlist_state()
+    ensure_indexes()
+    assign_playlist_partitions()
+    worker_leases.ensure_partitions()
+    print(f"🛠️ Checker worker {worker_leases.worker_id} started")
 
 def main():
     """Start the bot"""
-    import time
-    import threading
+    started = time.monotonic()
+    init_services()
     
     # Create application
     application = Application.builder().token(os.getenv('TELEGRAM_BOT_TOKEN')).build()
+    application.job_queue.run_repeating(
+        refresh_spotify_token, interval=TOKEN_REFRESH_CHECK, first=1, name='spotify_token_refresh'
+    )
+    
+    if BOT_MODE == 'worker':
+        application.job_queue.run_repeating(sync_worker, interval=LEASE_RENEW, first=0, name='worker_sync')
+        application.job_queue.run_repeating(
+            run_due_playlist_checks, interval=SCHEDULER_TICK, first=SCHEDULER_TICK, name='playlist_scheduler'
+        )
+        asyncio.run(run_bot(application, prepare_worker, started))
+        return
     
     # Add command handlers
     application.add_handler(CommandHandler("start", start))
@@ -508,65 +1638,29 @@ def main():
     application.add_handler(CommandHandler("setplaylist", set_playlist))
     application.add_handler(CommandHandler("status", status))
     application.add_handler(CommandHandler("forcecheck", force_check))
+    application.add_handler(CommandHandler("notifymode", notify_mode))
     application.add_handler(CommandHandler("stop", stop_tracking))
     
-    # Initialize tracked chats from database
-    print("📂 Loading tracked chats from database...")
-    all_configs = config_collection.find({
-        'platform': 'telegram',
-        'setting': 'playlist_id'
-    })
-    
-    for config in all_configs:
-        chat_id = config['chat_id']
-        playlist_id = config['playlist_id']
-        
-        saved_tracks, saved_data = get_saved_playlist_state('telegram', chat_id, playlist_id)
-        
-        tracked_chats[chat_id] = {
-            'playlist_id': playlist_id,
-            'previous_tracks': saved_tracks
-        }
-    
-    print(f"✅ Loaded {len(tracked_chats)} tracked chats from database")
-    
-    # Background checker function
-    def background_playlist_checker():
-        """Check playlists in background thread"""
-        time.sleep(10)  # Wait 10 seconds before first check
-        
-        while True:
-            try:
-                print("🔄 Checking all playlists...")
-                
-                # Create new event loop for this thread
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                
-                # Run the check
-                loop.run_until_complete(check_all_playlists(application))
-                
-                # Close the loop
-                loop.close()
-                
-            except Exception as e:
-                print(f"❌ Error in periodic check: {e}")
-            
-            # Wait 2 minutes before next check
-            time.sleep(120)
-    
-    # Start background checker thread
-    checker_thread = threading.Thread(target=background_playlist_checker, daemon=True)
-    checker_thread.start()
+    if BOT_MODE == 'frontend':
+        # Checker workers do the checking and leave notifications in MongoDB
+        application.job_queue.run_repeating(poll_outbox, interval=OUTBOX_POLL, first=OUTBOX_POLL, name='outbox')
+    else:
+        # Schedule playlist checks on the application's own event loop
+        application.job_queue.run_repeating(
+            run_due_playlist_checks,
+            interval=SCHEDULER_TICK,
+            first=10,  # Wait 10 seconds before first check
+            name='playlist_scheduler'
+        )
     
     # Start bot
     print("🤖 Telegram bot started!")
     print("✅ Ready to track Spotify playlists")
     print("📱 Send /start to your bot to begin")
-    print("⏰ Checking playlists every 2 minutes")
+    print(f"⏰ Checking playlists every {MIN_CHECK_INTERVAL}-{MAX_CHECK_INTERVAL} seconds (adaptive)")
     
-    # Run bot polling (blocks here)
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    # Runs until stopped
+    asyncio.run(run_bot(application, load_bot_state, started))
 
 if __name__ == '__main__':
     main()
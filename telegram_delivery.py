@@ -0,0 +1,360 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError
+from ttl_cache import TTLCache
+
+# Give up on a notification after this many failed network attempts
+MAX_DELIVERY_ATTEMPTS = 5
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+
+    def pause(self, seconds):
+        """Hand out no tokens for the next `seconds` seconds"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AlbumArtCache:
+    """Album art URL -> Telegram file_id of a photo already uploaded from it.
+
+    Once Telegram has fetched a cover, sending its file_id skips the download.
+    Entries live in memory (least recently used dropped first) and in
+    `collection`, so they survive restarts; MongoDB expires them with a TTL
+    index on created_at.
+    """
+
+    def __init__(self, collection, maxsize=5000, ttl=30 * 24 * 3600):
+        self.collection = collection
+        self.file_ids = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def load(self):
+        """Fill the memory cache with the newest saved entries (blocking)"""
+        saved = self.collection.find({}, {'file_id': 1}).sort('created_at', -1).limit(self.file_ids.maxsize)
+        for entry in reversed(list(saved)):
+            self.file_ids.put(entry['_id'], entry['file_id'])
+        return len(self.file_ids)
+
+    def get(self, url):
+        return self.file_ids.get(url)
+
+    async def remember(self, url, file_id):
+        self.file_ids.put(url, file_id)
+        await asyncio.to_thread(
+            self.collection.update_one,
+            {'_id': url},
+            {'$set': {'file_id': file_id, 'created_at': datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def forget(self, url):
+        self.file_ids.invalidate(url)
+        await asyncio.to_thread(self.collection.delete_one, {'_id': url})
+
+class NotificationQueue:
+    """Outbound Telegram delivery queue.
+
+    Notifications are plain dicts (chat_id, text, optional photo and
+    parse_mode). A notification with `media` (a list of photo/caption dicts)
+    is sent as one album instead, with `text` as its fallback. Each chat is
+    delivered in order by its own worker task, limited by a per-chat and a
+    global token bucket, so one slow or flood-limited chat doesn't hold up
+    the others. Notifications that have to be retried are stored in
+    `collection` so they survive restarts.
+    """
+
+    def __init__(self, collection, global_rate=25, chat_rate=1 / 3, chat_burst=3, album_art=None):
+        self.collection = collection
+        self.album_art = album_art
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_buckets = {}
+        self.chat_queues = {}
+        self.chat_workers = {}
+        # chat_id -> send of the chat's head notification, while it is in progress
+        self.sending = {}
+        self.application = None
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+
+    def depth(self):
+        """Number of notifications waiting to be sent"""
+        return sum(len(queue) for queue in self.chat_queues.values())
+
+    def put(self, notification):
+        """Queue a notification for delivery (never waits on Telegram)"""
+        notification.setdefault('attempts', 0)
+        notification.setdefault('created_at', datetime.utcnow())
+        chat_id = notification['chat_id']
+        self.chat_queues.setdefault(chat_id, deque()).append(notification)
+        self._start_worker(chat_id)
+
+    async def start(self, application):
+        """Start delivering, beginning with notifications saved for retry"""
+        self.application = application
+        if self.album_art:
+            cached = await asyncio.to_thread(self.album_art.load)
+            print(f"🖼️ Loaded {cached} cached album covers")
+        saved = await asyncio.to_thread(self._claim, {})
+        self._queue_claimed(saved)
+        for chat_id in list(self.chat_queues):
+            self._start_worker(chat_id)
+        if saved:
+            print(f"📬 Resuming {len(saved)} saved notifications")
+
+    async def poll_outbox(self):
+        """Queue notifications that checker workers have left in the collection"""
+        claimed = await asyncio.to_thread(self._claim, {'claimed': {'$ne': True}})
+        self._queue_claimed(claimed)
+
+    def _claim(self, query):
+        """Claim saved notifications for this process (blocking, so nothing here touches the queues)"""
+        saved = list(self.collection.find(query).sort('created_at', 1))
+        if saved:
+            self.collection.update_many(
+                {'_id': {'$in': [notification['_id'] for notification in saved]}},
+                {'$set': {'claimed': True}}
+            )
+        return saved
+
+    def _queue_claimed(self, notifications):
+        # On the event loop, where the chat workers also add and remove queues
+        for notification in notifications:
+            self.chat_queues.setdefault(notification['chat_id'], deque()).append(notification)
+            self._start_worker(notification['chat_id'])
+
+    async def stop(self):
+        """Save everything that hasn't been sent yet so it goes out after a restart"""
+        workers = list(self.chat_workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        # Sends cut short by the cancellation still run to the end; drop the ones that went out
+        sending, self.sending = self.sending, {}
+        results = await asyncio.gather(*sending.values(), return_exceptions=True)
+        for chat_id, result in zip(sending, results):
+            if not isinstance(result, BaseException):
+                notification = self.chat_queues[chat_id].popleft()
+                self.sent += 1
+                await self._forget(notification)
+        unsaved = [{**n, 'claimed': True} for queue in self.chat_queues.values() for n in queue if '_id' not in n]
+        if unsaved:
+            await asyncio.to_thread(self.collection.insert_many, unsaved)
+            print(f"📬 Saved {len(unsaved)} undelivered notifications")
+
+    def _start_worker(self, chat_id):
+        if self.application and chat_id not in self.chat_workers:
+            self.chat_workers[chat_id] = self.application.create_task(self._deliver_chat(chat_id))
+
+    async def _send_photo(self, notification, photo):
+        return await self.application.bot.send_photo(
+            chat_id=notification['chat_id'],
+            photo=photo,
+            caption=notification['text'],
+            parse_mode=notification.get('parse_mode')
+        )
+
+    async def _send_media_group(self, notification, media, file_ids):
+        return await self.application.bot.send_media_group(
+            chat_id=notification['chat_id'],
+            media=[
+                InputMediaPhoto(media=file_id or item['photo'], caption=item['caption'],
+                                parse_mode=notification.get('parse_mode'))
+                for item, file_id in zip(media, file_ids)
+            ]
+        )
+
+    async def _send_album(self, notification):
+        media = notification['media']
+        file_ids = [self.album_art and self.album_art.get(item['photo']) for item in media]
+        if any(file_ids):
+            try:
+                await self._send_media_group(notification, media, file_ids)
+                return
+            except BadRequest:
+                # One of the file_ids is stale; upload every cover from its URL again
+                for item, file_id in zip(media, file_ids):
+                    if file_id:
+                        await self.album_art.forget(item['photo'])
+        messages = await self._send_media_group(notification, media, [None] * len(media))
+        if self.album_art:
+            for item, message in zip(media, messages or ()):
+                if message.photo:
+                    await self.album_art.remember(item['photo'], message.photo[-1].file_id)
+
+    async def _send(self, notification):
+        bot = self.application.bot
+        url = notification.get('photo')
+        if notification.get('media'):
+            await self._send_album(notification)
+        elif url and self.album_art:
+            file_id = self.album_art.get(url)
+            if file_id:
+                try:
+                    await self._send_photo(notification, file_id)
+                    return
+                except BadRequest:
+                    # Stale file_id: upload from the URL again below
+                    await self.album_art.forget(url)
+            message = await self._send_photo(notification, url)
+            if message and message.photo:
+                await self.album_art.remember(url, message.photo[-1].file_id)
+        elif url:
+            await self._send_photo(notification, url)
+        else:
+            await bot.send_message(
+                chat_id=notification['chat_id'],
+                text=notification['text'],
+                parse_mode=notification.get('parse_mode')
+            )
+
+    async def _send_head(self, chat_id, notification):
+        # Shielded, so if stop() cancels the worker mid-send the send still
+        # finishes and stop() can tell whether the notification went out
+        sending = self.sending[chat_id] = asyncio.ensure_future(self._send(notification))
+        try:
+            await asyncio.shield(sending)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            del self.sending[chat_id]
+            raise
+        del self.sending[chat_id]
+
+    async def _save_for_retry(self, notification):
+        if '_id' in notification:
+            await asyncio.to_thread(
+                self.collection.update_one,
+                {'_id': notification['_id']},
+                {'$set': {'attempts': notification['attempts'], 'photo': notification.get('photo'),
+                          'media': notification.get('media')}}
+            )
+        else:
+            notification['claimed'] = True
+            result = await asyncio.to_thread(self.collection.insert_one, notification)
+            notification['_id'] = result.inserted_id
+
+    async def _forget(self, notification):
+        if '_id' in notification:
+            await asyncio.to_thread(self.collection.delete_one, {'_id': notification['_id']})
+
+    async def _deliver_chat(self, chat_id):
+        queue = self.chat_queues[chat_id]
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        try:
+            while queue:
+                notification = queue[0]
+                await bucket.acquire()
+                await self.global_bucket.acquire()
+                try:
+                    await self._send_head(chat_id, notification)
+                    self.sent += 1
+                except RetryAfter as e:
+                    # Flood control: keep the notification at the front and wait as told
+                    self.rate_limited += 1
+                    retry_after = e.retry_after
+                    if isinstance(retry_after, timedelta):
+                        retry_after = retry_after.total_seconds()
+                    bucket.pause(retry_after)
+                    await self._save_for_retry(notification)
+                    continue
+                # BadRequest is a NetworkError subclass, so it has to come first
+                except BadRequest as e:
+                    if notification.get('media'):
+                        # Telegram wouldn't take the album; send the digest as text
+                        notification['media'] = None
+                        continue
+                    if notification.get('photo'):
+                        # Telegram couldn't use the album art; send the text on its own
+                        notification['photo'] = None
+                        continue
+                    print(f"❌ Dropping notification for chat {chat_id}: {e}")
+                    self.failed += 1
+                except NetworkError as e:
+                    notification['attempts'] += 1
+                    if notification['attempts'] < MAX_DELIVERY_ATTEMPTS:
+                        bucket.pause(2 ** notification['attempts'])
+                        await self._save_for_retry(notification)
+                        continue
+                    print(f"❌ Giving up on notification for chat {chat_id}: {e}")
+                    self.failed += 1
+                except TelegramError as e:
+                    # Bot was blocked/removed from the chat and similar
+                    print(f"❌ Dropping notification for chat {chat_id}: {e}")
+                    self.failed += 1
+                queue.popleft()
+                await self._forget(notification)
+        finally:
+            del self.chat_workers[chat_id]
+            if not queue:
+                del self.chat_queues[chat_id]
+
+class NotificationOutbox:
+    """Stand-in for NotificationQueue in checker workers.
+
+    Workers don't talk to Telegram: notifications are written to the
+    collection and the front end's NotificationQueue picks them up with
+    poll_outbox(), so Telegram's rate limits are still enforced in one place.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.pending = []
+        self.flushing = None
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+
+    def depth(self):
+        return len(self.pending)
+
+    def put(self, notification):
+        notification.setdefault('attempts', 0)
+        notification.setdefault('created_at', datetime.utcnow())
+        self.pending.append(notification)
+        if self.flushing is None or self.flushing.done():
+            self.flushing = asyncio.get_running_loop().create_task(self._flush())
+
+    async def start(self, application):
+        pass
+
+    async def stop(self):
+        await self._flush()
+
+    async def _flush(self):
+        while self.pending:
+            batch, self.pending = self.pending, []
+            try:
+                await asyncio.to_thread(self.collection.insert_many, batch)
+                self.sent += len(batch)
+            except Exception as e:
+                print(f"❌ Error writing {len(batch)} notifications to the outbox: {e}")
+                self.pending = batch + self.pending
+                self.failed += 1
+                await asyncio.sleep(5)
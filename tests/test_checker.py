@@ -0,0 +1,106 @@
+import asyncio
+import time
+import telegram_bot as bot
+from benchmarks.fakes import FakeBot, FakeDatabase, FakeSpotify, FakeSpotifyServer
+from benchmarks.run import install_fakes, seed, wait_for_delivery
+
+PLAYLIST_ID = 'playlist00000'
+
+async def start_fakes(tracks=150, chats=1):
+    spotify = FakeSpotify()
+    server = FakeSpotifyServer(spotify)
+    await server.start()
+    telegram = FakeBot()
+    application = install_fakes(server, FakeDatabase(), telegram, spotify_rate=1000)
+    seed(spotify, 1, tracks, chats)
+    bot.load_tracked_playlists()
+    await bot.notification_queue.start(application)
+    return spotify, server, telegram, application
+
+async def stop_fakes(server):
+    await bot.spotify_client.aclose()
+    await server.stop()
+
+def test_local_files_are_skipped():
+    async def scenario():
+        spotify, server, telegram, application = await start_fakes()
+        try:
+            # Appended after the saved tail: checked by the tail fast path
+            spotify.add_local_file(PLAYLIST_ID, 'demo.mp3')
+            spotify.add_tracks(PLAYLIST_ID, 2)
+            assert await bot.check_playlist(application, PLAYLIST_ID)
+            await wait_for_delivery(bot.notification_queue)
+            assert len(telegram.sent) == 2
+
+            # A full fetch of a playlist holding a local file
+            spotify.add_tracks(PLAYLIST_ID, 1)
+            bot.tracked_playlists[PLAYLIST_ID]['tail_checks'] = bot.FULL_FETCH_EVERY
+            assert await bot.check_playlist(application, PLAYLIST_ID)
+            await wait_for_delivery(bot.notification_queue)
+            assert len(telegram.sent) == 3
+
+            current_tracks, _ = await bot.fetch_current_tracks(PLAYLIST_ID)
+            assert None not in current_tracks
+            assert len(current_tracks) == 153
+        finally:
+            await stop_fakes(server)
+    asyncio.run(scenario())
+
+def test_forced_check_waits_for_buffered_cycle_writes(monkeypatch):
+    save_playlist_writes = bot.save_playlist_writes
+    def slow_save(writes):
+        time.sleep(0.2)
+        save_playlist_writes(writes)
+    monkeypatch.setattr(bot, 'save_playlist_writes', slow_save)
+
+    async def scenario():
+        spotify, server, telegram, application = await start_fakes()
+        try:
+            spotify.add_tracks(PLAYLIST_ID, 2)
+            cycle = asyncio.create_task(bot.check_all_playlists(application, [PLAYLIST_ID]))
+            # Checked, with the writes still waiting for the cycle to save them
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if bot.tracked_playlists[PLAYLIST_ID].get('last_check'):
+                    break
+            assert PLAYLIST_ID in bot.checks_in_flight
+
+            # The forced check waits for the cycle's writes, then checks afresh
+            spotify.add_tracks(PLAYLIST_ID, 1)
+            calls = spotify.calls
+            assert await bot.check_playlist_for_chat(application, 1000)
+            assert spotify.calls > calls
+            assert PLAYLIST_ID not in bot.checks_in_flight
+            await cycle
+
+            saved = bot.playlist_collection.find_one({'platform': 'telegram', 'playlist_id': PLAYLIST_ID})
+            assert saved['snapshot_id'] == bot.tracked_playlists[PLAYLIST_ID]['snapshot_id']
+            assert len(bot.get_saved_track_ids('telegram', PLAYLIST_ID)[0]) == 153
+            await wait_for_delivery(bot.notification_queue)
+            assert len(telegram.sent) == 3
+        finally:
+            await stop_fakes(server)
+    asyncio.run(scenario())
+
+def test_failed_cycle_save_reloads_the_stored_state(monkeypatch):
+    save_playlist_writes = bot.save_playlist_writes
+    def failing_save(writes):
+        raise ConnectionError('MongoDB is down')
+
+    async def scenario():
+        spotify, server, telegram, application = await start_fakes()
+        try:
+            spotify.add_tracks(PLAYLIST_ID, 2)
+            monkeypatch.setattr(bot, 'save_playlist_writes', failing_save)
+            await bot.check_all_playlists(application, [PLAYLIST_ID])
+            assert len(bot.get_saved_track_ids('telegram', PLAYLIST_ID)[0]) == 150
+
+            # The next check diffs against what is stored, not the unsaved state
+            monkeypatch.setattr(bot, 'save_playlist_writes', save_playlist_writes)
+            await bot.check_all_playlists(application, [PLAYLIST_ID])
+            saved = bot.playlist_collection.find_one({'platform': 'telegram', 'playlist_id': PLAYLIST_ID})
+            assert saved['snapshot_id'] == bot.tracked_playlists[PLAYLIST_ID]['snapshot_id']
+            assert len(bot.get_saved_track_ids('telegram', PLAYLIST_ID)[0]) == 152
+        finally:
+            await stop_fakes(server)
+    asyncio.run(scenario())
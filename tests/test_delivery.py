@@ -0,0 +1,48 @@
+import asyncio
+from telegram_delivery import NotificationOutbox, NotificationQueue
+from benchmarks.fakes import FakeApplication, FakeBot, FakeCollection
+
+def test_stop_does_not_resend_a_finished_send():
+    collection = FakeCollection('notifications')
+    telegram = FakeBot(latency=0.2)
+
+    async def scenario():
+        queue = NotificationQueue(collection)
+        await queue.start(FakeApplication(telegram))
+        queue.put({'chat_id': 1, 'text': 'first'})
+        queue.put({'chat_id': 1, 'text': 'second'})
+        # Stop while the first notification is being sent
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        assert not queue.chat_workers
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert telegram.sent == [('message', 1)]
+    assert queue.sent == 1
+    # Only the notification that never went out is kept for the next start
+    assert [notification['text'] for notification in collection.find({})] == ['second']
+
+def test_outbox_notifications_are_delivered():
+    collection = FakeCollection('notifications')
+    telegram = FakeBot()
+
+    async def scenario():
+        outbox = NotificationOutbox(collection)
+        for text in ('first', 'second', 'third'):
+            outbox.put({'chat_id': 1, 'text': text})
+        await outbox.stop()
+        queue = NotificationQueue(collection, chat_rate=100, chat_burst=10)
+        await queue.start(FakeApplication(telegram))
+        for text in ('fourth', 'fifth'):
+            outbox.put({'chat_id': 1, 'text': text})
+        await outbox.stop()
+        await queue.poll_outbox()
+        while queue.chat_workers:
+            await asyncio.sleep(0.01)
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert queue.sent == 5
+    assert not queue.chat_queues
+    assert collection.count_documents({}) == 0
@@ -0,0 +1,29 @@
+from datetime import datetime
+from types import SimpleNamespace
+import telegram_bot as bot
+from benchmarks.fakes import FakeBot, FakeDatabase
+from benchmarks.run import install_fakes
+
+def test_migration_runs_once_per_version():
+    database = FakeDatabase()
+    install_fakes(SimpleNamespace(url='http://127.0.0.1:9/v1/'), database, FakeBot(), spotify_rate=1000)
+    # A per-chat state saved by an old version of the bot
+    bot.playlist_collection.insert_one({
+        'platform': 'telegram', 'chat_id': 1000, 'playlist_id': 'playlist00000',
+        'track_ids': ['4uLU6hMCjMI75M1A2tKUQC'], 'last_updated': datetime.utcnow()
+    })
+    bot.save_chat_playlist_id(1000, 'playlist00000')
+
+    bot.migrate_chat_playlist_state()
+    state = bot.playlist_collection.find_one({'platform': 'telegram', 'playlist_id': 'playlist00000'})
+    assert 'chat_id' not in state
+    assert state['subscribers'] == [1000]
+    assert state['state_format'] == bot.STATE_FORMAT
+    assert len(bot.get_saved_track_ids('telegram', 'playlist00000')[0]) == 1
+
+    # Later starts only read the recorded version
+    playlist_operations = bot.playlist_collection.operations
+    config_operations = bot.config_collection.operations
+    bot.migrate_chat_playlist_state()
+    assert bot.playlist_collection.operations == playlist_operations
+    assert bot.config_collection.operations == config_operations + 1
@@ -0,0 +1,104 @@
+import asyncio
+import time
+import pytest
+from spotipy.exceptions import SpotifyException
+from spotify_client import AsyncSpotify
+from spotify_governor import GovernedSpotify, SpotifyGovernor
+from benchmarks.fakes import FakeSpotify, FakeSpotifyAuth, FakeSpotifyServer
+
+class ExpiringAuth:
+    """Auth manager whose cached token is about to expire"""
+
+    def __init__(self):
+        self.cache_handler = self
+        self.refreshes = 0
+
+    def get_cached_token(self):
+        return {'access_token': 'expiring', 'expires_at': time.time() + 30}
+
+    def get_access_token(self, as_dict=True):
+        self.refreshes += 1
+        return 'refreshed'
+
+def run_against_fake_server(scenario, auth=None, **spotify_options):
+    """Run scenario(client, spotify, server) with an AsyncSpotify talking to a FakeSpotifyServer"""
+    async def main():
+        spotify = FakeSpotify(**spotify_options)
+        spotify.create_playlist('playlist1', 250)
+        server = FakeSpotifyServer(spotify)
+        await server.start()
+        client = AsyncSpotify(auth or FakeSpotifyAuth(), base_url=server.url, max_connections=2)
+        try:
+            await scenario(client, spotify, server)
+        finally:
+            await client.aclose()
+            await server.stop()
+    asyncio.run(main())
+
+def test_playlist_items_pages_and_fields():
+    async def scenario(client, spotify, server):
+        fields = 'total,items(track(id))'
+        pages = [await client.playlist_items('playlist1', fields=fields, limit=100, offset=offset)
+                 for offset in (0, 100, 200)]
+        assert [len(page['items']) for page in pages] == [100, 100, 50]
+        assert all(page['total'] == 250 for page in pages)
+        track_ids = [item['track']['id'] for page in pages for item in page['items']]
+        assert track_ids == spotify.playlists['playlist1']
+        assert [request['query'] for request in server.requests] == [
+            {'fields': fields, 'limit': '100', 'offset': str(offset)} for offset in (0, 100, 200)
+        ]
+        assert server.requests[0]['path'] == '/v1/playlists/playlist1/items'
+    run_against_fake_server(scenario)
+
+def test_playlist_and_tracks():
+    async def scenario(client, spotify, server):
+        assert await client.playlist('playlist1', fields='snapshot_id') == {'snapshot_id': 'playlist1-1'}
+        track_ids = spotify.playlists['playlist1'][:3]
+        result = await client.tracks(track_ids)
+        assert [track['id'] for track in result['tracks']] == track_ids
+        assert server.requests[-1]['query'] == {'ids': ','.join(track_ids)}
+    run_against_fake_server(scenario)
+
+def test_not_found_raises_spotify_exception():
+    async def scenario(client, spotify, server):
+        with pytest.raises(SpotifyException) as error:
+            await client.playlist('missing')
+        assert error.value.http_status == 404
+    run_against_fake_server(scenario)
+
+def test_rate_limit_reaches_governor():
+    async def scenario(client, spotify, server):
+        governor = SpotifyGovernor(rate=100, burst=100)
+        sp = GovernedSpotify(client, governor)
+        started = time.monotonic()
+        # Every 2nd request gets a 429 with Retry-After: 1
+        await sp.playlist('playlist1', fields='snapshot_id')
+        assert await sp.playlist('playlist1', fields='snapshot_id') == {'snapshot_id': 'playlist1-1'}
+        assert governor.rate_limited == 1
+        assert time.monotonic() - started >= 1
+        assert len(server.requests) == 3
+    run_against_fake_server(scenario, rate_limit_every=2, retry_after=1)
+
+def test_expiring_token_is_refreshed():
+    auth = ExpiringAuth()
+    async def scenario(client, spotify, server):
+        await client.playlist('playlist1', fields='snapshot_id')
+        assert auth.refreshes == 1
+        assert server.requests[0]['authorization'] == 'Bearer refreshed'
+    run_against_fake_server(scenario, auth=auth)
+
+def test_fresh_token_is_used_as_is():
+    async def scenario(client, spotify, server):
+        await client.playlist('playlist1', fields='snapshot_id')
+        assert server.requests[0]['authorization'] == 'Bearer benchmark'
+    run_against_fake_server(scenario)
+
+def test_connections_are_reused():
+    async def scenario(client, spotify, server):
+        for _ in range(5):
+            await client.playlist('playlist1', fields='snapshot_id')
+        assert server.connections == 1
+        # max_connections=2 caps concurrent requests too
+        await asyncio.gather(*(client.playlist('playlist1', fields='snapshot_id') for _ in range(10)))
+        assert server.connections == 2
+    run_against_fake_server(scenario, latency=0.02)
@@ -0,0 +1,34 @@
+import random
+from track_ids import TrackIdSet, decode_track_id, encode_track_id
+from benchmarks.fakes import random_id
+
+def test_encode_decode_round_trip():
+    rng = random.Random(0)
+    for track_id in [random_id(rng) for _ in range(100)] + ['0' * 22, 'z' * 22]:
+        assert decode_track_id(encode_track_id(track_id)) == track_id
+
+def test_from_ids_leaves_out_non_ids():
+    # Local files come back from Spotify with a null ID
+    track_id = random_id(random.Random(1))
+    track_ids = TrackIdSet.from_ids([None, '', 'not-an-id', 42, track_id])
+    assert list(track_ids) == [track_id]
+    assert None not in track_ids
+
+def test_difference_and_union_match_sets():
+    rng = random.Random(2)
+    for _ in range(300):
+        previous = [random_id(rng) for _ in range(rng.randint(0, 80))]
+        current = rng.sample(previous, rng.randint(0, len(previous))) + [random_id(rng) for _ in range(rng.randint(0, 10))]
+        previous_set, current_set = TrackIdSet.from_ids(previous), TrackIdSet.from_ids(current)
+        assert current_set - previous_set == TrackIdSet.from_ids(set(current) - set(previous))
+        assert previous_set - current_set == TrackIdSet.from_ids(set(previous) - set(current))
+        assert previous_set | current_set == TrackIdSet.from_ids(set(previous) | set(current))
+        assert previous_set - current == TrackIdSet.from_ids(set(previous) - set(current))
+        assert previous_set | current == TrackIdSet.from_ids(set(previous) | set(current))
+
+def test_contains():
+    rng = random.Random(3)
+    track_ids = [random_id(rng) for _ in range(50)]
+    track_id_set = TrackIdSet.from_ids(track_ids[:25])
+    assert all(track_id in track_id_set for track_id in track_ids[:25])
+    assert not any(track_id in track_id_set for track_id in track_ids[25:])
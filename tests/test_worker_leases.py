@@ -0,0 +1,84 @@
+from datetime import datetime
+from types import SimpleNamespace
+import telegram_bot as bot
+from benchmarks.fakes import FakeBot, FakeCollection, FakeDatabase, FakeSpotify
+from benchmarks.run import install_fakes, seed
+from worker_leases import PartitionLeases, partition_of
+
+def start_workers(collection, count, partitions):
+    workers = [PartitionLeases(collection, partitions=partitions, worker_id=f'worker{index}')
+               for index in range(count)]
+    workers[0].ensure_partitions()
+    # Each worker only sees the others once their heartbeats are in
+    for _ in range(2):
+        for worker in workers:
+            worker.sync()
+    return workers
+
+def expire(collection, worker):
+    """Let a worker's heartbeat and leases run out, as if it had died"""
+    collection.update_many({'owner': worker.worker_id}, {'$set': {'expires_at': datetime(1970, 1, 1)}})
+    collection.update_one({'_id': f'worker:{worker.worker_id}'}, {'$set': {'expires_at': datetime(1970, 1, 1)}})
+
+def test_joining_worker_gets_its_share():
+    collection = FakeCollection('checker_leases')
+    first, = start_workers(collection, 1, 8)
+    assert first.owned == set(range(8))
+
+    second = PartitionLeases(collection, partitions=8, worker_id='worker1')
+    second.sync()
+    # Nothing is free until the first worker gives back what is over its share
+    assert second.owned == set()
+    first.sync()
+    second.sync()
+    assert len(first.owned) == len(second.owned) == 4
+    assert first.owned | second.owned == set(range(8))
+
+def test_uneven_split_between_three_workers():
+    workers = start_workers(FakeCollection('checker_leases'), 3, 8)
+    for worker in workers:
+        worker.sync()
+    assert sorted(len(worker.owned) for worker in workers) == [2, 3, 3]
+    assert set().union(*(worker.owned for worker in workers)) == set(range(8))
+
+def test_partitions_move_on_release_and_expiry():
+    collection = FakeCollection('checker_leases')
+    first, second, third = start_workers(collection, 3, 9)
+    for worker in (first, second, third):
+        worker.sync()
+
+    # A worker that shuts down hands its partitions over right away
+    second.release()
+    first.sync()
+    third.sync()
+    assert second.owned == set()
+    assert first.owned | third.owned == set(range(9))
+
+    # A dead worker's partitions are only taken once its leases expire
+    dead = set(third.owned)
+    first.sync()
+    assert not first.owned & dead
+    expire(collection, third)
+    first.sync()
+    assert first.owned == set(range(9))
+
+def test_workers_track_only_the_playlists_in_their_partitions(monkeypatch):
+    database = FakeDatabase()
+    install_fakes(SimpleNamespace(url='http://127.0.0.1:9/v1/'), database, FakeBot(), spotify_rate=1000)
+    seed(FakeSpotify(), 20, 5, 1)
+    # Subscribed before partitions were stored
+    bot.playlist_collection.update_one(
+        {'platform': 'telegram', 'playlist_id': 'playlist00000'}, {'$unset': {'partition': ''}}
+    )
+    bot.assign_playlist_partitions()
+
+    tracked = []
+    for worker in start_workers(database['checker_leases'], 2, bot.CHECK_PARTITIONS):
+        monkeypatch.setattr(bot, 'worker_leases', worker)
+        bot.tracked_playlists.clear()
+        bot.sync_worker_playlists()
+        assert all(partition_of(playlist_id, bot.CHECK_PARTITIONS) in worker.owned
+                   for playlist_id in bot.tracked_playlists)
+        tracked.append(set(bot.tracked_playlists))
+    assert not tracked[0] & tracked[1]
+    assert len(tracked[0] | tracked[1]) == 20
@@ -0,0 +1,166 @@
+import bisect
+import string
+
+# Spotify IDs are 22 base62 characters; 62**22 needs 17 bytes
+BASE62 = string.digits + string.ascii_letters
+ID_LENGTH = 22
+KEY_SIZE = 17
+_DIGITS = {char: value for value, char in enumerate(BASE62)}
+
+def encode_track_id(track_id):
+    """Spotify track ID -> 17-byte key (byte order matches numeric order)"""
+    if not isinstance(track_id, str) or len(track_id) != ID_LENGTH:
+        raise ValueError(f"Not a Spotify ID: {track_id!r}")
+    value = 0
+    try:
+        for char in track_id:
+            value = value * 62 + _DIGITS[char]
+    except KeyError:
+        raise ValueError(f"Not a Spotify ID: {track_id!r}") from None
+    return value.to_bytes(KEY_SIZE, 'big')
+
+def decode_track_id(key):
+    """17-byte key -> Spotify track ID"""
+    value = int.from_bytes(key, 'big')
+    chars = []
+    for _ in range(ID_LENGTH):
+        value, digit = divmod(value, 62)
+        chars.append(BASE62[digit])
+    return ''.join(reversed(chars))
+
+class _Keys:
+    """Sequence view of a blob of sorted keys, for bisect"""
+
+    def __init__(self, blob):
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.blob) // KEY_SIZE
+
+    def __getitem__(self, index):
+        start = index * KEY_SIZE
+        return self.blob[start:start + KEY_SIZE]
+
+def _equal_run(ours, i, theirs, j):
+    """Bytes of identical keys at ours[i:] and theirs[j:].
+
+    Playlists mostly stay the same between checks, so the merge in TrackIdSet
+    skips runs of equal keys by comparing ever larger (then smaller) blocks
+    in C instead of stepping through them one key at a time.
+    """
+    limit = min(len(ours) - i, len(theirs) - j)
+    equal = 0
+    step = KEY_SIZE
+    while equal + step <= limit and ours[i + equal:i + equal + step] == theirs[j + equal:j + equal + step]:
+        equal += step
+        step *= 2
+    while step > KEY_SIZE:
+        step //= 2
+        if equal + step <= limit and ours[i + equal:i + equal + step] == theirs[j + equal:j + equal + step]:
+            equal += step
+    return equal
+
+class TrackIdSet:
+    """Immutable set of Spotify track IDs packed into one bytes object.
+
+    IDs are stored as sorted 17-byte keys, about 17 bytes per track instead
+    of well over 100 for a set of strings. Iterating yields the IDs as
+    strings; `-` and `|` work like they do on sets (by merging the two sorted
+    blobs), and the other operand can be another TrackIdSet or any iterable
+    of IDs. Anything that isn't a Spotify ID (like the null ID of a local
+    file) is left out.
+    """
+
+    __slots__ = ('blob',)
+
+    def __init__(self, blob=b''):
+        self.blob = bytes(blob)
+
+    @classmethod
+    def from_ids(cls, track_ids):
+        keys = []
+        for track_id in track_ids:
+            try:
+                keys.append(encode_track_id(track_id))
+            except ValueError:
+                pass
+        return cls.from_keys(keys)
+
+    @classmethod
+    def from_keys(cls, keys):
+        return cls(b''.join(sorted(set(keys))))
+
+    def keys(self):
+        blob = self.blob
+        return (blob[start:start + KEY_SIZE] for start in range(0, len(blob), KEY_SIZE))
+
+    def __len__(self):
+        return len(self.blob) // KEY_SIZE
+
+    def __bool__(self):
+        return bool(self.blob)
+
+    def __iter__(self):
+        return map(decode_track_id, self.keys())
+
+    def __contains__(self, track_id):
+        try:
+            key = encode_track_id(track_id)
+        except ValueError:
+            return False
+        keys = _Keys(self.blob)
+        index = bisect.bisect_left(keys, key)
+        return index < len(keys) and keys[index] == key
+
+    def __eq__(self, other):
+        return isinstance(other, TrackIdSet) and self.blob == other.blob
+
+    def __repr__(self):
+        return f'TrackIdSet({len(self)} tracks)'
+
+    @staticmethod
+    def _other_blob(other):
+        if isinstance(other, TrackIdSet):
+            return other.blob
+        return TrackIdSet.from_ids(other).blob
+
+    def __sub__(self, other):
+        ours, theirs = self.blob, self._other_blob(other)
+        result = bytearray()
+        i = j = 0
+        while i < len(ours) and j < len(theirs):
+            run = _equal_run(ours, i, theirs, j)
+            i += run
+            j += run
+            if i >= len(ours) or j >= len(theirs):
+                break
+            key = ours[i:i + KEY_SIZE]
+            if key < theirs[j:j + KEY_SIZE]:
+                result += key
+                i += KEY_SIZE
+            else:
+                j += KEY_SIZE
+        result += ours[i:]
+        return TrackIdSet(result)
+
+    def __or__(self, other):
+        ours, theirs = self.blob, self._other_blob(other)
+        result = bytearray()
+        i = j = 0
+        while i < len(ours) and j < len(theirs):
+            run = _equal_run(ours, i, theirs, j)
+            result += ours[i:i + run]
+            i += run
+            j += run
+            if i >= len(ours) or j >= len(theirs):
+                break
+            key, other_key = ours[i:i + KEY_SIZE], theirs[j:j + KEY_SIZE]
+            if key < other_key:
+                result += key
+                i += KEY_SIZE
+            else:
+                result += other_key
+                j += KEY_SIZE
+        result += ours[i:]
+        result += theirs[j:]
+        return TrackIdSet(result)
@@ -0,0 +1,113 @@
+import hashlib
+import math
+import os
+import socket
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+def partition_of(playlist_id, partitions):
+    """Partition a playlist belongs to (stable across processes, unlike hash())"""
+    digest = hashlib.blake2b(playlist_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % partitions
+
+def default_worker_id():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+class PartitionLeases:
+    """Splits playlist partitions between checker workers through expiring leases.
+
+    Every worker keeps a heartbeat document and leases on the partitions it
+    owns in `collection`, renewing both on each sync(). A worker takes free or
+    expired partitions until it holds its fair share (partitions / live
+    workers) and gives back any above that, so partitions move to new workers
+    and away from dead ones (once their leases expire) without coordination.
+    """
+
+    def __init__(self, collection, partitions=64, ttl=60, worker_id=None):
+        self.collection = collection
+        self.partitions = partitions
+        self.ttl = ttl
+        self.worker_id = worker_id or default_worker_id()
+        self.owned = set()
+
+    def ensure_partitions(self):
+        """Create the lease documents that don't exist yet"""
+        try:
+            self._create_partitions()
+        except BulkWriteError:
+            # Workers starting together race on the upserts; the losers' duplicates are harmless
+            pass
+
+    def _create_partitions(self):
+        self.collection.bulk_write([
+            UpdateOne(
+                {'_id': f'partition:{partition}'},
+                {'$setOnInsert': {'kind': 'partition', 'partition': partition,
+                                  'owner': None, 'expires_at': datetime(1970, 1, 1)}},
+                upsert=True
+            )
+            for partition in range(self.partitions)
+        ], ordered=False)
+
+    def sync(self):
+        """Renew, take and give back leases; returns the partitions now owned"""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        self.collection.update_one(
+            {'_id': f'worker:{self.worker_id}'},
+            {'$set': {'kind': 'worker', 'expires_at': expires_at}},
+            upsert=True
+        )
+        live_workers = self.collection.count_documents({'kind': 'worker', 'expires_at': {'$gt': now}})
+        fair_share = math.ceil(self.partitions / max(1, live_workers))
+
+        self.collection.update_many(
+            {'kind': 'partition', 'owner': self.worker_id, 'expires_at': {'$gt': now}},
+            {'$set': {'expires_at': expires_at}}
+        )
+        owned = sorted(
+            lease['partition'] for lease in self.collection.find(
+                {'kind': 'partition', 'owner': self.worker_id, 'expires_at': {'$gt': now}},
+                {'_id': 0, 'partition': 1}
+            )
+        )
+
+        if len(owned) > fair_share:
+            extra = owned[fair_share:]
+            self.collection.update_many(
+                {'kind': 'partition', 'partition': {'$in': extra}, 'owner': self.worker_id},
+                {'$set': {'owner': None, 'expires_at': now}}
+            )
+            owned = owned[:fair_share]
+        elif len(owned) < fair_share:
+            free = [
+                lease['partition'] for lease in self.collection.find(
+                    {'kind': 'partition', 'expires_at': {'$lte': now}},
+                    {'_id': 0, 'partition': 1}
+                )
+            ]
+            for partition in free[:fair_share - len(owned)]:
+                # Another worker may have taken it since the find; the filter makes this a no-op then
+                claimed = self.collection.find_one_and_update(
+                    {'_id': f'partition:{partition}', 'expires_at': {'$lte': now}},
+                    {'$set': {'owner': self.worker_id, 'expires_at': expires_at}}
+                )
+                if claimed:
+                    owned.append(partition)
+
+        if set(owned) != self.owned:
+            print(f"🧩 Worker {self.worker_id} owns {len(owned)}/{self.partitions} partitions "
+                  f"({live_workers} live workers)")
+        self.owned = set(owned)
+        return self.owned
+
+    def release(self):
+        """Give back every lease (on shutdown) so other workers take over right away"""
+        now = datetime.utcnow()
+        self.collection.update_many(
+            {'kind': 'partition', 'owner': self.worker_id},
+            {'$set': {'owner': None, 'expires_at': now}}
+        )
+        self.collection.delete_one({'_id': f'worker:{self.worker_id}'})
+        self.owned = set()